@@ -0,0 +1,177 @@
+"""Benchmark suite of the Veolia client, run against the offline fake service.
+
+Measures envelope building, response parsing, ``async_update_all`` end to
+end and a coordinator refresh (when Home Assistant is installed).
+
+    python benchmarks/bench_client.py
+    python benchmarks/bench_client.py --save baseline.json
+    python benchmarks/bench_client.py --compare baseline.json --threshold 1.25
+
+With --compare, the run exits with status 1 if a benchmark got slower than
+threshold times its baseline.
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "custom_components"))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from fake_icl import TOKEN, FakeICLService, daily_payload, monthly_payload  # noqa: E402
+from veolia_water.VeoliaClient import VeoliaClient  # noqa: E402
+from veolia_water.decoder import decode  # noqa: E402
+from veolia_water.soap import render_request  # noqa: E402
+
+
+def summarize(name: str, samples: list) -> dict:
+    """Return the statistics of the samples, in milliseconds."""
+    samples = sorted(s * 1000 for s in samples)
+    return {
+        "name": name,
+        "runs": len(samples),
+        "mean": statistics.fmean(samples),
+        "p50": samples[len(samples) // 2],
+        "p95": samples[min(int(len(samples) * 0.95), len(samples) - 1)],
+    }
+
+
+def measure(name: str, func, runs: int) -> dict:
+    """Time a synchronous function."""
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return summarize(name, samples)
+
+
+async def ameasure(name: str, func, runs: int) -> dict:
+    """Time a coroutine function."""
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        await func()
+        samples.append(time.perf_counter() - start)
+    return summarize(name, samples)
+
+
+def bench_envelopes(runs: int) -> list:
+    """Build consumption requests."""
+
+    def build():
+        for _ in range(1000):
+            render_request("getConsommationJournaliere", "user@example.com", TOKEN, aboNum="600000")
+
+    return [measure("envelope x1000", build, runs)]
+
+
+def bench_parsing(runs: int, years: int) -> list:
+    """Decode daily and monthly responses of several years."""
+    end = date.today()
+    daily = daily_payload(years * 365, end)
+    monthly = monthly_payload(years * 12, end)
+    results = [
+        measure(f"decode daily {years}y", lambda: decode("getConsommationJournaliere", daily), runs),
+        measure(f"decode monthly {years}y", lambda: decode("getConsommationMensuelle", monthly), runs),
+    ]
+    try:
+        import xmltodict
+    except ImportError:
+        return results
+    results.append(measure(f"xmltodict daily {years}y (reference)", lambda: xmltodict.parse(daily), runs))
+    return results
+
+
+async def bench_update_all(runs: int, contracts: int, years: int) -> list:
+    """Refresh every contract of an account from a fresh client."""
+    async with FakeICLService(contracts=contracts, days=years * 365, months=years * 12) as service:
+
+        async def update():
+            client = VeoliaClient("user@example.com", "password")
+            client.transport.address = service.url
+            await client.async_update_all()
+            await client.async_close_session()
+
+        return [await ameasure(f"update_all {contracts}x{years}y", update, runs)]
+
+
+async def bench_coordinator(runs: int, contracts: int, years: int) -> list:
+    """Refresh a coordinator, as Home Assistant does on each poll."""
+    try:
+        from homeassistant.core import HomeAssistant
+        from veolia_water.coordinator import VeoliaDataUpdateCoordinator
+        from veolia_water.auth_cache import VeoliaAuthCache
+        from veolia_water.const import DOMAIN
+    except ImportError:
+        print("Home Assistant is not installed, coordinator benchmark skipped")
+        return []
+
+    class NoStatistics:
+        """The recorder is not running here."""
+
+        async def async_import(self, *args):
+            return 0
+
+    with tempfile.TemporaryDirectory() as config_dir:
+        hass = HomeAssistant(config_dir)
+        hass.data[DOMAIN] = {}
+        async with FakeICLService(contracts=contracts, days=years * 365, months=years * 12) as service:
+            client = VeoliaClient("user@example.com", "password")
+            client.transport.address = service.url
+            coordinator = VeoliaDataUpdateCoordinator(hass, client, VeoliaAuthCache(hass), "benchmark")
+            coordinator.auth_cache._data = {}
+            coordinator.statistics = NoStatistics()
+            first = await ameasure(f"coordinator first refresh {contracts}x{years}y", coordinator.async_refresh, 1)
+            steady = await ameasure(f"coordinator refresh {contracts}x{years}y", coordinator.async_refresh, runs)
+            await client.async_close_session()
+        await hass.async_stop(force=True)
+    return [first, steady]
+
+
+def main():
+    """Run the suite."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--contracts", type=int, default=5)
+    parser.add_argument("--years", type=int, default=3)
+    parser.add_argument("--save", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="compare the results with this JSON file")
+    parser.add_argument("--threshold", type=float, default=1.25)
+    args = parser.parse_args()
+
+    results = bench_envelopes(args.runs) + bench_parsing(args.runs, args.years)
+    results += asyncio.run(bench_update_all(args.runs, args.contracts, args.years))
+    results += asyncio.run(bench_coordinator(args.runs, args.contracts, args.years))
+
+    print(f"{'benchmark':45s} {'runs':>5s} {'mean ms':>9s} {'p50 ms':>9s} {'p95 ms':>9s}")
+    for result in results:
+        print(
+            f"{result['name']:45s} {result['runs']:5d} "
+            f"{result['mean']:9.2f} {result['p50']:9.2f} {result['p95']:9.2f}"
+        )
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=2)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as file:
+            baseline = {result["name"]: result for result in json.load(file)}
+        regressions = [
+            (result["name"], result["p50"] / baseline[result["name"]]["p50"])
+            for result in results
+            if result["name"] in baseline and result["p50"] > baseline[result["name"]]["p50"] * args.threshold
+        ]
+        for name, ratio in regressions:
+            print(f"REGRESSION {name}: {ratio:.2f}x slower than baseline")
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
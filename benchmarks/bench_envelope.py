@@ -0,0 +1,77 @@
+"""Micro-benchmark of SOAP request building.
+
+Compares the pre-rendered templates of ``soap.py`` with the former path of
+the client: ``deepcopy`` of a prebuilt envelope, ``find`` chains and
+``ET.tostring`` on every call.
+
+    python benchmarks/bench_envelope.py [--number N]
+"""
+import argparse
+from copy import deepcopy
+from datetime import datetime, timezone
+import os
+import sys
+import timeit
+import xml.etree.ElementTree as ET
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "custom_components"))
+
+from veolia_water.soap import (  # noqa: E402
+    ANONYMOUS_PASSWORD,
+    ANONYMOUS_USERNAME,
+    FORMAT_CREATED,
+    build_envelope,
+    render_request,
+)
+
+EMAIL = "user@example.com"
+TOKEN = "PYg6fMplCoo19dZVXkn2PYg6fMplCoo19dZVXkn2"
+
+
+def legacy_body(enveloppe, action, elts, anonymous=True):
+    """Build a request the way the client did before the templates."""
+    datas = deepcopy(enveloppe)
+    _body = datas.find("soap:Body")
+    _action = ET.SubElement(_body, f"ns2:{action}")
+    _action.set("xmlns:ns2", "http://ws.icl.veolia.com/")
+    for k, v in elts.items():
+        ET.SubElement(_action, k).text = v
+    if not anonymous:
+        username_token = datas.find("soap:Header").find("wsse:Security").find("wsse:UsernameToken")
+        username_token.find("wsse:Username").text = EMAIL
+        username_token.find("wsse:Password").text = TOKEN
+    return ET.tostring(datas, encoding="UTF-8")
+
+
+def main():
+    """Run the benchmark and print the time per request."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--number", type=int, default=20000)
+    args = parser.parse_args()
+
+    created = datetime.now(timezone.utc).strftime(FORMAT_CREATED)
+    # The former envelope: built once, body left empty
+    enveloppe = build_envelope("placeholder", {}, ANONYMOUS_USERNAME, ANONYMOUS_PASSWORD, created)
+    enveloppe.find("soap:Body").clear()
+
+    expected = legacy_body(enveloppe, "getConsommationJournaliere", {"aboNum": "123456"}, anonymous=False)
+    rendered = render_request("getConsommationJournaliere", EMAIL, TOKEN, aboNum="123456", created=created)
+    assert rendered == expected, (rendered, expected)
+
+    cases = {
+        "legacy deepcopy + ElementTree": lambda: legacy_body(
+            enveloppe, "getConsommationJournaliere", {"aboNum": "123456"}, anonymous=False
+        ),
+        "pre-rendered template": lambda: render_request("getConsommationJournaliere", EMAIL, TOKEN, aboNum="123456"),
+    }
+    timings = {}
+    for name, func in cases.items():
+        best = min(timeit.repeat(func, number=args.number, repeat=5))
+        timings[name] = best / args.number
+        print(f"{name:32s} {timings[name] * 1e6:8.2f} us/request")
+    legacy, template = timings.values()
+    print(f"{'speedup':32s} {legacy / template:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
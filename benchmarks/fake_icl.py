@@ -0,0 +1,250 @@
+"""Offline stand-in for the Veolia ICL SOAP web service.
+
+Serves getAuthentificationFront, getConsommationJournaliere and
+getConsommationMensuelle from generated payloads, so that the client can be
+exercised without network access:
+
+    python benchmarks/fake_icl.py --contracts 3 --days 1500 --port 8080
+
+and in-process, from benchmarks:
+
+    async with FakeICLService(contracts=10, days=3 * 365) as service:
+        client.transport.address = service.url
+"""
+import argparse
+import asyncio
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+import random
+import re
+
+from aiohttp import web
+
+NS_ICL = "http://ws.icl.veolia.com/"
+TOKEN = "FAKE-TOKEN"
+
+_ACTION_RE = re.compile(rb"<ns2:(\w+)")
+_ABO_RE = re.compile(rb"<aboNum>([^<]*)</aboNum>")
+_PASSWORD_RE = re.compile(rb"<wsse:Password[^>]*>([^<]*)</wsse:Password>")
+_RANGE_RE = re.compile(rb"<dateDebut>([^<]*)</dateDebut><dateFin>([^<]*)</dateFin>")
+
+
+def envelope(body: str) -> bytes:
+    """Wrap a SOAP body in an envelope, the way the service does."""
+    return (
+        '<soap:Envelope xmlns:soap="http://schemas.xmlsoap.org/soap/envelope/"><soap:Body>'
+        f"{body}</soap:Body></soap:Envelope>"
+    ).encode()
+
+
+def fault_payload(faultstring: str, faultcode: str = "soap:Server") -> bytes:
+    """Return a SOAP fault."""
+    return envelope(
+        f"<soap:Fault><faultcode>{faultcode}</faultcode><faultstring>{faultstring}</faultstring></soap:Fault>"
+    )
+
+
+def auth_payload(contracts: list, token: str = TOKEN) -> bytes:
+    """Return the getAuthentificationFront response of an account."""
+    contrats = "".join(
+        f"<listContrats><aboId>{abo_id}</aboId><type>EAU</type></listContrats>" for abo_id in contracts
+    )
+    return envelope(
+        f'<ns2:getAuthentificationFrontResponse xmlns:ns2="{NS_ICL}"><return>'
+        f"<espaceClient><cptEmail>user@example.com</cptEmail><cptPwd>{token}</cptPwd></espaceClient>"
+        f"{contrats}</return></ns2:getAuthentificationFrontResponse>"
+    )
+
+
+def daily_records(days: int, end: date, seed: int = 0) -> list:
+    """Return (date, liters, index) readings of the last days, oldest first."""
+    rng = random.Random(seed)
+    index = 100000
+    records = []
+    for offset in range(days - 1, -1, -1):
+        liters = rng.randint(80, 400)
+        records.append((end - timedelta(days=offset), liters, index))
+        index += liters
+    return records
+
+
+def daily_payload(days: int, end: date, seed: int = 0, records: list | None = None) -> bytes:
+    """Return a getConsommationJournaliere response, most recent reading first."""
+    if records is None:
+        records = daily_records(days, end, seed)
+    rows = "".join(
+        f"<return><consommation>{liters}</consommation><dateReleve>{day.isoformat()}T00:00:00+01:00</dateReleve>"
+        f"<index>{index}</index><typeReleve>R</typeReleve></return>"
+        for day, liters, index in reversed(records)
+    )
+    return envelope(
+        f'<ns2:getConsommationJournaliereResponse xmlns:ns2="{NS_ICL}">{rows}</ns2:getConsommationJournaliereResponse>'
+    )
+
+
+def monthly_payload(months: int, end: date, seed: int = 0) -> bytes:
+    """Return a getConsommationMensuelle response."""
+    rng = random.Random(seed)
+    rows = []
+    year, month = end.year, end.month
+    for _ in range(months):
+        rows.append(
+            f"<return><annee>{year}</annee><mois>{month}</mois><consommation>{rng.randint(3000, 9000)}</consommation>"
+            "</return>"
+        )
+        year, month = (year, month - 1) if month > 1 else (year - 1, 12)
+    return envelope(
+        f'<ns2:getConsommationMensuelleResponse xmlns:ns2="{NS_ICL}">{"".join(rows)}'
+        "</ns2:getConsommationMensuelleResponse>"
+    )
+
+
+@dataclass
+class FakeICLService:
+    """Configurable fake of the ICL service.
+
+    Attributes:
+        contracts: number of contracts of the account
+        days: daily readings returned per contract (1 gives a single-record response)
+        history_days: daily readings kept per contract, returned by the calls with a date range
+        months: monthly consumptions returned per contract
+        end: day of the last reading
+        latency: seconds slept before answering
+        failure_rate: share of consumption calls answered with HTTP 503
+        fault: faultstring returned by every consumption call
+        reject_tokens: consumption calls answered with an authentication fault
+        bad_password: password refused by getAuthentificationFront
+    """
+
+    contracts: int = 1
+    days: int = 365
+    history_days: int = 0
+    months: int = 24
+    end: date = field(default_factory=lambda: date.today() - timedelta(days=1))
+    latency: float = 0
+    failure_rate: float = 0
+    fault: str | None = None
+    reject_tokens: int = 0
+    bad_password: str = "bad"
+    calls: list = field(default_factory=list)
+
+    def __post_init__(self) -> None:
+        """Pre-render the payloads."""
+        self.contract_ids = [str(600000 + i) for i in range(self.contracts)]
+        self._rng = random.Random(0)
+        self._runner = None
+        self.url = None
+        self._payloads = {}
+
+    def payload(self, action: str, abo_id: str) -> bytes:
+        """Return the response of a consumption call, rendered once per contract."""
+        key = (action, abo_id)
+        if key not in self._payloads:
+            seed = int(abo_id) if abo_id.isdigit() else 0
+            if action == "getConsommationJournaliere":
+                records = self.history(abo_id)[-self.days :]
+                self._payloads[key] = daily_payload(self.days, self.end, seed, records)
+            else:
+                self._payloads[key] = monthly_payload(self.months, self.end, seed)
+        return self._payloads[key]
+
+    def history(self, abo_id: str) -> list:
+        """Return every daily reading of a contract, oldest first."""
+        seed = int(abo_id) if abo_id.isdigit() else 0
+        return daily_records(max(self.history_days, self.days), self.end, seed)
+
+    def range_payload(self, abo_id: str, start: date, end: date) -> bytes:
+        """Return the daily readings of a contract from start to end, among its history_days."""
+        records = [record for record in self.history(abo_id) if start <= record[0] <= end]
+        return daily_payload(len(records), end, records=records)
+
+    async def handle(self, request: web.Request) -> web.Response:
+        """Answer a SOAP call."""
+        body = await request.read()
+        match = _ACTION_RE.search(body)
+        action = match.group(1).decode() if match else None
+        self.calls.append(action)
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if action == "getAuthentificationFront":
+            if f"<cptPwd>{self.bad_password}</cptPwd>".encode() in body:
+                return web.Response(status=500, body=fault_payload("Identifiant ou mot de passe incorrect"))
+            return web.Response(body=auth_payload(self.contract_ids))
+        if action not in ("getConsommationJournaliere", "getConsommationMensuelle"):
+            return web.Response(status=500, body=fault_payload(f"Unknown operation {action}", "soap:Client"))
+        password = _PASSWORD_RE.search(body)
+        if self.reject_tokens or not password or password.group(1) != TOKEN.encode():
+            self.reject_tokens = max(self.reject_tokens - 1, 0)
+            fault = fault_payload("Authentication token expired", "wsse:FailedAuthentication")
+            return web.Response(status=500, body=fault)
+        if self.failure_rate and self._rng.random() < self.failure_rate:
+            return web.Response(status=503, text="Service Unavailable")
+        if self.fault:
+            return web.Response(status=500, body=fault_payload(self.fault))
+        abo = _ABO_RE.search(body)
+        abo_id = abo.group(1).decode() if abo else ""
+        period = _RANGE_RE.search(body)
+        if period and action == "getConsommationJournaliere":
+            start, end = (date.fromisoformat(day.decode()) for day in period.groups())
+            return web.Response(body=self.range_payload(abo_id, start, end))
+        return web.Response(body=self.payload(action, abo_id))
+
+    def application(self) -> web.Application:
+        """Return the aiohttp application of the service."""
+        app = web.Application()
+        app.router.add_post("/icl-ws/iclWebService", self.handle)
+        return app
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """Start serving, and return the address of the web service."""
+        self._runner = web.AppRunner(self.application())
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        port = self._runner.addresses[0][1]
+        self.url = f"http://{host}:{port}/icl-ws/iclWebService"
+        return self.url
+
+    async def stop(self) -> None:
+        """Stop serving."""
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def __aenter__(self) -> "FakeICLService":
+        """Start the service."""
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        """Stop the service."""
+        await self.stop()
+
+
+def main():
+    """Serve the fake service until interrupted."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--contracts", type=int, default=1)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--history-days", type=int, default=0)
+    parser.add_argument("--months", type=int, default=24)
+    parser.add_argument("--latency", type=float, default=0)
+    parser.add_argument("--failure-rate", type=float, default=0)
+    parser.add_argument("--fault")
+    args = parser.parse_args()
+    service = FakeICLService(
+        contracts=args.contracts,
+        days=args.days,
+        history_days=args.history_days,
+        months=args.months,
+        latency=args.latency,
+        failure_rate=args.failure_rate,
+        fault=args.fault,
+    )
+    web.run_app(service.application(), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
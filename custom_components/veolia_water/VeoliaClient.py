@@ -1,21 +1,23 @@
 """API Program for Veolia."""
 
-from copy import deepcopy as copy
-from datetime import datetime
+import asyncio
+from datetime import date, datetime, timezone
 import logging
-import operator
-import xml.etree.ElementTree as ET
 
-import requests
-import xmltodict
+import aiohttp
 
-from .const import DAILY, FORMAT_DATE, HISTORY, MONTHLY
+from .aggregates import AggregateIndex
+from .analytics import analyze
+from .const import AGGREGATES, ANALYTICS, DAILY, FRESHNESS, HISTORY, MONTHLY
+from .decoder import MonthlyRecord
+from .history import DailyHistory, MonthlyHistory
+from .hub import VeoliaError, VeoliaHub
 
 _LOGGER: logging.Logger = logging.getLogger(__package__)
 
 
-class VeoliaError(Exception):
-    """Error from API."""
+class VeoliaAuthError(VeoliaError):
+    """Token rejected by the server."""
 
     pass
 
@@ -26,261 +28,374 @@ class BadCredentialsException(Exception):
     pass
 
 
+# Fragments of SOAP faults sent back when the token is no longer accepted
+AUTH_FAULT_MARKERS = ("authenti", "token", "password", "mot de passe", "security", "expir")
+
+
 class VeoliaClient:
     """Class to manage the webServices system."""
 
-    def __init__(self, email: str, password: str, session=requests.Session(), abo_id="") -> None:
-        """Initialize the client object."""
+    def __init__(
+        self,
+        email: str,
+        password: str,
+        session: aiohttp.ClientSession | None = None,
+        abo_id="",
+        hub: VeoliaHub | None = None,
+    ) -> None:
+        """Initialize the client object.
+
+        The authentication, the transport and the session are those of the hub
+        of the account, shared with the other clients of the account; a hub of
+        its own is created when none is given.
+        When abo_id is empty, every contract of the account is followed.
+        """
         self._email = email
-        self._pwd = password
         self.__aboId = abo_id
-        self.address = "https://www.service.eau.veolia.fr/icl-ws/iclWebService"
-        self.headers = {"Content-Type": "application/xml; charset=UTF-8"}
-        self.__tokenPassword = None
+        self.hub = hub or VeoliaHub(email, password, session)
+        self.contracts = [abo_id] if abo_id else []
         self.success = False
-        self.attributes = {DAILY: {}, MONTHLY: {}}
-        # self.session = session
-        self.session = requests.Session()
-        self.__enveloppe = self.__create_enveloppe()
-
-    def login(self):
+        self.changed = False
+        # Incremented whenever the data changes
+        self.version = 0
+        self.failed_contracts = {}
+        self.attributes = {}
+        # Optional HistoryArchive receiving every new reading
+        self.archive = None
+        # Digest of the last response merged, by (contract, period)
+        self._merged_digests = {}
+
+    async def async_login(self):
         """Check if login is right.
 
         raise BadCredentialsException if not
         """
         try:
             _LOGGER.info("Check credentials")
-            self._get_tokenPassword(check_only=True)
+            await self.hub.async_login(check_only=True)
         except Exception as e:
-            _LOGGER.error(f"wrong authentication : {e}")
+            _LOGGER.error("wrong authentication : %s", e)
             raise BadCredentialsException(f"wrong authentication : {e}")
 
-    def update_all(self):
+    async def async_update_all(self):
         """
         Return the latest collected datas.
 
+        Logs in once, then the consumptions of every contract are fetched
+        concurrently, at most MAX_CONCURRENT_REQUESTS at a time.
+        New readings are merged into the known history; self.changed tells
+        whether anything was added or updated.
+
         Returns:
-            dict: dict of consumptions by date and by period
+            dict: dict of consumptions by date and by period, by contract
         """
-        self.update()
-        self.update(True)
+        with self.metrics.measure("update_all"):
+            await self._async_ensure_login()
+            self.changed = False
+            results = await asyncio.gather(
+                *[self._async_update_contract(abo_id) for abo_id in self.contracts], return_exceptions=True
+            )
+        # A contract which could not be refreshed keeps its previous data
+        self.failed_contracts = {}
+        for abo_id, result in zip(self.contracts, results):
+            if isinstance(result, BaseException):
+                if not isinstance(result, Exception):
+                    raise result
+                _LOGGER.warning("Update of contract %s failed: %s", abo_id, result)
+                self.metrics.error("contract_failed")
+                self.failed_contracts[abo_id] = result
+        if self.changed:
+            self.version += 1
+        if results and len(self.failed_contracts) == len(results):
+            raise next(iter(self.failed_contracts.values()))
         return self.attributes
 
-    def update(self, month=False):
+    async def _async_update_contract(self, abo_id):
+        """Fetch the daily consumptions of a contract, and the monthly ones only when needed.
+
+        Closed months never change, and the open month is the sum of its daily
+        readings: getConsommationMensuelle is only called when a month closed
+        since the last call, or when the daily history does not cover the open month.
+        """
+        attributes = self._contract_attributes(abo_id)
+        monthly = self._monthly_outdated(attributes)
+        if monthly:
+            await asyncio.gather(self.async_fetch_data(abo_id), self.async_fetch_data(abo_id, True))
+        else:
+            await self.async_fetch_data(abo_id)
+        if not await self._async_derive_open_month(abo_id, attributes) and not monthly:
+            await self.async_fetch_data(abo_id, True)
+
+    def _contract_attributes(self, abo_id):
+        """Return the data of a contract, created on first use."""
+        attributes = self.attributes.get(abo_id)
+        if attributes is None:
+            attributes = self.attributes[abo_id] = {
+                DAILY: {HISTORY: DailyHistory(), FRESHNESS: {}},
+                MONTHLY: {HISTORY: MonthlyHistory(), FRESHNESS: {}},
+                AGGREGATES: AggregateIndex(),
+                ANALYTICS: None,
+            }
+        return attributes
+
+    def snapshot(self):
+        """Return the data of every contract, to be stored as JSON."""
+        return {
+            abo_id: {
+                period: {
+                    HISTORY: attributes[period][HISTORY].as_dict(),
+                    FRESHNESS: {
+                        key: value.isoformat() if hasattr(value, "isoformat") else value
+                        for key, value in attributes[period][FRESHNESS].items()
+                    },
+                }
+                for period in (DAILY, MONTHLY)
+            }
+            for abo_id, attributes in self.attributes.items()
+        }
+
+    def restore_snapshot(self, snapshot):
+        """Restore the data returned by snapshot, and rebuild what derives from it.
+
+        Returns:
+            bool: True if every followed contract was restored
+        """
+        if not snapshot:
+            return False
+        if self.__aboId == "" and not self.contracts:
+            self.contracts = list(snapshot)
+        for abo_id, data in snapshot.items():
+            attributes = self._contract_attributes(abo_id)
+            for period, history_class in ((DAILY, DailyHistory), (MONTHLY, MonthlyHistory)):
+                attributes[period][HISTORY] = history_class.from_dict(data[period][HISTORY])
+                freshness = dict(data[period][FRESHNESS])
+                if freshness.get("last_fetch"):
+                    freshness["last_fetch"] = datetime.fromisoformat(freshness["last_fetch"])
+                attributes[period][FRESHNESS] = freshness
+            daily = attributes[DAILY][HISTORY]
+            attributes["last_index"] = daily.last_index
+            attributes[AGGREGATES].update(daily)
+            attributes[ANALYTICS] = analyze(daily)
+        self.version += 1
+        _LOGGER.debug("restored %d contracts from the snapshot", len(snapshot))
+        return all(abo_id in self.attributes for abo_id in self.contracts)
+
+    @staticmethod
+    def _monthly_outdated(attributes):
+        """Return True if a month closed since the last call to getConsommationMensuelle."""
+        last_fetch = attributes[MONTHLY][FRESHNESS].get("last_fetch")
+        if last_fetch is None or not attributes[MONTHLY][HISTORY]:
+            return True
+        last_fetch = last_fetch.astimezone().date()
+        today = date.today()
+        return (last_fetch.year, last_fetch.month) != (today.year, today.month)
+
+    async def _async_derive_open_month(self, abo_id, attributes):
+        """Set the consumption of the month of the last daily reading from the daily history.
+
+        Returns:
+            bool: False if the daily history does not start before that month
+        """
+        daily = attributes[DAILY][HISTORY]
+        latest = daily.latest()
+        if latest is None:
+            return False
+        first_day = latest[0].replace(day=1)
+        if daily.keys[0] > first_day.toordinal():
+            return False
+        liters = attributes[AGGREGATES].total(first_day, latest[0])
+        monthly = attributes[MONTHLY][HISTORY]
+        merged = monthly.merge([MonthlyRecord(first_day.year, first_day.month, liters)])
+        attributes[MONTHLY][FRESHNESS].update(
+            open_month="daily", derived_from=latest[0], last_reading=monthly.latest()[0]
+        )
+        if merged:
+            self.changed = True
+            await self._async_archive(abo_id, MONTHLY, merged)
+        return True
+
+    async def _async_archive(self, abo_id, period, records):
+        """Store new readings in the archive, if any, out of the event loop."""
+        if self.archive is None:
+            return
+        with self.metrics.measure("archive"):
+            await asyncio.get_running_loop().run_in_executor(None, self.archive.upsert, abo_id, period, records)
+
+    async def async_update(self, abo_id, month=False):
         """
         Return the latest collected datas by arg.
 
         Args:
+            abo_id (str): contract to fetch
             month (bool, optional): if True returns consumption by Month else by Day. Defaults to False.
 
         Returns:
             dict: dict of consumptions by date
         """
-        if self.__tokenPassword is None:
-            self._get_tokenPassword()
-        self._fetch_data(month)
+        await self._async_ensure_login()
+        self.changed = False
+        await self.async_fetch_data(abo_id, month)
+        if self.changed:
+            self.version += 1
         if not self.success:
             return
         period = MONTHLY if month is True else DAILY
-        return self.attributes[period]
-
-    def close_session(self):
-        """Close current session."""
-        self.session.close()
-        self.session = None
-
-    def _fetch_data(self, month=False):
-        """Fetch latest data from Veolia."""
-        _LOGGER.debug(f"_fetch_data by month ? {month}")
+        return self.attributes[abo_id][period]
+
+    @property
+    def account(self):
+        """Return the account the client is logged with."""
+        return self._email
+
+    @property
+    def metrics(self):
+        """Return the metrics of the account."""
+        return self.hub.metrics
+
+    @property
+    def transport(self):
+        """Return the transport of the account."""
+        return self.hub.transport
+
+    @property
+    def is_authenticated(self):
+        """Return True when a token is known and not expired."""
+        return self.hub.is_authenticated
+
+    def auth_state(self):
+        """Return the authentication state to cache between restarts."""
+        return self.hub.auth_state()
+
+    def restore_auth_state(self, state):
+        """Reuse a cached authentication state, unless it has expired or the hub is logged in."""
+        if not self.hub.is_authenticated and not self.hub.restore_auth_state(state):
+            return False
+        self._follow_contracts()
+        return True
+
+    async def _async_ensure_login(self):
+        """Log in through the hub unless it is, and follow the contracts of the account."""
+        await self.hub.async_ensure_login()
+        self._follow_contracts()
+
+    def _follow_contracts(self):
+        """Follow every contract of the account when no contract was given."""
+        if self.__aboId == "":
+            self.contracts = list(self.hub.account_contracts)
+            _LOGGER.debug("No Abo_ID provided, following %d contracts", len(self.contracts))
+
+    async def async_close_session(self):
+        """Close the session of the hub if it owns it."""
+        await self.hub.async_close_session()
+
+    async def async_fetch_data(self, abo_id, month=False):
+        """Fetch latest data of a contract from Veolia.
+
+        The call is retried once with a new token if the server rejects the current one.
+        """
+        token_created = self.hub.token_created
+        try:
+            await self._async_fetch_data(abo_id, month)
+        except VeoliaAuthError:
+            self.metrics.error("auth_rejected")
+            await self.hub.async_reauthenticate(token_created)
+            await self._async_fetch_data(abo_id, month)
+
+    async def _async_fetch_data(self, abo_id, month=False):
+        """Fetch latest data of a contract from Veolia."""
         period = MONTHLY if month is True else DAILY
         if month is True:
             action = "getConsommationMensuelle"
         else:
             action = "getConsommationJournaliere"
-        _LOGGER.debug(f"action={action}")
-        datas = self.__construct_body(action, {"aboNum": self.__aboId}, anonymous=False)
-
-        resp = self.session.post(
-            self.address,
-            headers=self.headers,
-            data=datas,
-        )
-        _LOGGER.debug(str(resp))
-        _LOGGER.debug(str(resp.text))
-        if resp.status_code != 200:
-            # Améliorer le retour si erreur 500 : possibilité de récupérer le message du serveur
-            msg = f"Error {resp.status_code} fetching data :"
-            try:
-                msg += xmltodict.parse(f"<soap:Envelope{resp.text.split('soap:Envelope')[1]}soap:Envelope>")[
-                    "soap:Envelope"
-                ]["soap:Body"]["soap:Fault"]["faultstring"]
-            except Exception:
-                msg += str(resp.text)
-            _LOGGER.error(msg)
-            raise Exception(f"{msg}")
-        else:
-            try:
-                result = xmltodict.parse(f"<soap:Envelope{resp.text.split('soap:Envelope')[1]}soap:Envelope>")
-                _LOGGER.debug(f"result_fetch_data={result}")
-                lstindex = result["soap:Envelope"]["soap:Body"][f"ns2:{action}Response"]["return"]
-                self.attributes[period][HISTORY] = []
-
-                # sort date desc and append in list of tuple (date,liters)
-                if month is True:
-                    if isinstance(lstindex, list):
-                        lstindex.sort(key=operator.itemgetter("annee", "mois"), reverse=True)
-                        for val in lstindex:
-                            self.attributes[period][HISTORY].append(
-                                (
-                                    f"{val['annee']}-{val['mois']}",
-                                    int(val["consommation"]),
-                                )
-                            )
-                    elif isinstance(lstindex, dict):
-                        self.attributes[period][HISTORY].append(
-                            (
-                                f"{lstindex['annee']}-{lstindex['mois']}",
-                                int(lstindex["consommation"]),
-                            )
-                        )
-
-                else:
-                    if isinstance(lstindex, list):
-                        lstindex.sort(key=operator.itemgetter("dateReleve"), reverse=True)
-                        for val in lstindex:
-                            self.attributes[period][HISTORY].append(
-                                (
-                                    datetime.strptime(val["dateReleve"], FORMAT_DATE).date(),
-                                    int(val["consommation"]),
-                                )
-                            )
-                        self.attributes["last_index"] = int(lstindex[0]["index"]) + int(lstindex[0]["consommation"])
-                    elif isinstance(lstindex, dict):
-                        self.attributes[period][HISTORY].append(
-                            (
-                                datetime.strptime(lstindex["dateReleve"], FORMAT_DATE).date(),
-                                int(lstindex["consommation"]),
-                            )
-                        )
-                        self.attributes["last_index"] = int(lstindex["index"]) + int(lstindex["consommation"])
-                self.success = True
-            except ValueError:
-                raise VeoliaError("Issue with accessing data")
-                pass
-
-    def _get_tokenPassword(self, check_only=False):
-        """Get token password for next actions who needs authentication."""
-        datas = self.__construct_body(
-            "getAuthentificationFront",
-            {"cptEmail": self._email, "cptPwd": self._pwd},
-            anonymous=True,
+        attributes = self._contract_attributes(abo_id)
+
+        metrics = self.metrics
+        status, decoder = await self.hub.async_call(action, abo_id)
+        metrics.observe(f"{period}_bytes", decoder.size)
+        self._check_response(status, decoder)
+
+        metrics.observe(f"{period}_records", len(decoder.records))
+        history = attributes[period][HISTORY]
+        merged = []
+        # a body identical to the response merged last time has nothing to merge
+        if not decoder.unchanged or self._merged_digests.get((abo_id, period)) != decoder.digest:
+            with metrics.measure("merge"):
+                merged = history.merge(decoder.records)
+                if merged and month is False:
+                    attributes["last_index"] = history.last_index
+                    attributes[AGGREGATES].update(history)
+            self._merged_digests[(abo_id, period)] = decoder.digest
+        if merged and month is False:
+            with metrics.measure("analytics"):
+                attributes[ANALYTICS] = analyze(history)
+        _LOGGER.debug("%d new readings in %s of %s", len(merged), action, abo_id)
+        latest = history.latest()
+        attributes[period][FRESHNESS].update(
+            last_fetch=datetime.now(timezone.utc), last_reading=latest[0] if latest else None
         )
-        # _LOGGER.debug(f"_get_token_password : {datas.replace(self._pwd,"MySecretPassWord")}")
-        resp = self.session.post(
-            self.address,
-            headers=self.headers,
-            data=datas,
-        )
-        _LOGGER.debug(f"resp status={resp.status_code}")
-        if resp.status_code != 200:
-            _LOGGER.error("problem with authentication")
-            raise Exception(f"POST /__get_tokenPassword/ {resp.status_code}")
-        else:
-            result = xmltodict.parse(f"<soap:Envelope{resp.text.split('soap:Envelope')[1]}soap:Envelope>")
-            _LOGGER.debug(f"result_getauth={result}")
-            if check_only:
-                return None
-            self.__tokenPassword = result["soap:Envelope"]["soap:Body"]["ns2:getAuthentificationFrontResponse"][
-                "return"
-            ]["espaceClient"]["cptPwd"]
-            contrat = result["soap:Envelope"]["soap:Body"]["ns2:getAuthentificationFrontResponse"]["return"][
-                "listContrats"
-            ]
-
-            if self.__aboId == "":
-                _LOGGER.debug("No Abo_ID provided, finding first")
-                if isinstance(contrat, list):
-                    self.__aboId = contrat[0]["aboId"]
-                else:
-                    self.__aboId = contrat["aboId"]
-            _LOGGER.debug(f"__aboId={self.__aboId}")
-            # _LOGGER.debug(f"__tokenPassword={self.__tokenPassword}")
-
-    def __create_enveloppe(self):
-        """Return enveloppe for requests.
+        if month is True:
+            attributes[period][FRESHNESS]["open_month"] = "api"
+        if merged:
+            self.changed = True
+            await self._async_archive(abo_id, period, merged)
+        self.success = True
+
+    def _check_response(self, status, decoder):
+        """Raise the error of a consumption call which did not succeed."""
+        if status == 200:
+            return
+        # Améliorer le retour si erreur 500 : possibilité de récupérer le message du serveur
+        msg = f"Error {status} fetching data :"
+        fault = decoder.fault or {}
+        msg += fault.get("faultstring", "")
+        fault_text = f"{fault.get('faultcode')} {fault.get('faultstring')}".lower()
+        if status in (401, 403) or (fault and any(marker in fault_text for marker in AUTH_FAULT_MARKERS)):
+            _LOGGER.warning(msg)
+            raise VeoliaAuthError(msg)
+        self.metrics.error(f"fault_{status}")
+        _LOGGER.error(msg)
+        raise Exception(f"{msg}")
+
+    async def async_fetch_range(self, abo_id, start, end):
+        """Fetch the daily readings of a contract from start to end, both included.
+
+        The call is retried once with a new token if the server rejects the current one.
 
         Returns:
-            xml: enveloppe
+            list: decoded daily records
         """
-        # <soap:Envelope xmlns:soap="http://schemas.xmlsoap.org/soap/envelope/" xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance">
-        __enveloppe = ET.Element("soap:Envelope")
-        __enveloppe.set("xmlns:soap", "http://schemas.xmlsoap.org/soap/envelope/")
-        __enveloppe.set("xmlns:xsi", "http://www.w3.org/2001/XMLSchema-instance")
-        # <soap:Header>
-        __header = ET.SubElement(__enveloppe, "soap:Header")
-        # <wsse:Security xmlns:wsse="http://docs.oasis-open.org/wss/2004/01/oasis-200401-wss-wssecurity-secext-1.0.xsd" xmlns:wsu="http://docs.oasis-open.org/wss/2004/01/oasis-200401-wss-wssecurity-utility-1.0.xsd">
-        __security = ET.SubElement(__header, "wsse:Security")
-        __security.set(
-            "xmlns:wsse",
-            "http://docs.oasis-open.org/wss/2004/01/oasis-200401-wss-wssecurity-secext-1.0.xsd",
-        )
-        __security.set(
-            "xmlns:wsu",
-            "http://docs.oasis-open.org/wss/2004/01/oasis-200401-wss-wssecurity-utility-1.0.xsd",
-        )
-        # <wsse:UsernameToken xmlns:wsu="http://docs.oasis-open.org/wss/2004/01/oasis-200401-wss-wssecurity-utility-1.0.xsd" wsu:Id="UsernameToken-aiehdbsf52">
-        __usernameToken = ET.SubElement(__security, "wsse:UsernameToken")
-        __usernameToken.set(
-            "xmlns:wsu",
-            "http://docs.oasis-open.org/wss/2004/01/oasis-200401-wss-wssecurity-utility-1.0.xsd",
-        )
-        __usernameToken.set("wsu:Id", "UsernameToken-aiehdbsf52")
-        # <wsse:Username>anonyme</wsse:Username>
-        __username = ET.SubElement(__usernameToken, "wsse:Username")
-        __username.text = "anonyme"
-        # <wsse:Password Type="http://docs.oasis-open.org/wss/2004/01/oasis-200401-wss-username-token-profile-1.0#PasswordText">PYg6fMplCoo19dZVXkn2</wsse:Password>
-        __password = ET.SubElement(__usernameToken, "wsse:Password")
-        __password.set(
-            "Type",
-            "http://docs.oasis-open.org/wss/2004/01/oasis-200401-wss-username-token-profile-1.0#PasswordText",
-        )
-        __password.text = "PYg6fMplCoo19dZVXkn2"
-        # <wsse:Nonce EncodingType="http://docs.oasis-open.org/wss/2004/01/oasis-200401-wss-soap-message-security-1.0#Base64Binary">1dWl+HzD/sJsWzAcDHQX6Q==</wsse:Nonce>
-        __nonce = ET.SubElement(__usernameToken, "wsse:Nonce")
-        __nonce.set(
-            "EncodingType",
-            "http://docs.oasis-open.org/wss/2004/01/oasis-200401-wss-soap-message-security-1.0#Base64Binary",
-        )
-        __nonce.text = "1dWl+HzD/sJsWzAcDHQX6Q=="
-        # <wsse:Created>2022-11-22T07:54:00.000Z</wsse:Created>
-        __created = ET.SubElement(__usernameToken, "wsse:Created")
-        __created.text = datetime.now().strftime("%Y-%m-%dT%H:%M:%S.%fZ")
-        # <soap:Body>
-        ET.SubElement(__enveloppe, "soap:Body")
-        return __enveloppe
-
-    def __construct_body(self, action: str, elts: dict, anonymous=True):
-        """Append action into a copy of _enveloppe.
-
-        Args:
-            action (str): Name of action
-            elts (dict): elements to insert into action
-            anonymous (bool, optional): anonymous authentication. Defaults to True.
+        await self._async_ensure_login()
+        values = {"dateDebut": start.isoformat(), "dateFin": end.isoformat()}
+        token_created = self.hub.token_created
+        try:
+            status, decoder = await self.hub.async_call("getConsommationJournaliere", abo_id, **values)
+            self._check_response(status, decoder)
+        except VeoliaAuthError:
+            self.metrics.error("auth_rejected")
+            await self.hub.async_reauthenticate(token_created)
+            status, decoder = await self.hub.async_call("getConsommationJournaliere", abo_id, **values)
+            self._check_response(status, decoder)
+        self.metrics.observe("backfill_records", len(decoder.records))
+        return decoder.records
+
+    async def async_merge_history(self, abo_id, records):
+        """Merge daily readings of any date into the history of a contract, and archive them.
 
         Returns:
-            xml: completed enveloppe for requests
+            list: (key, *values) rows which were added or changed
         """
-        datas = copy(self.__enveloppe)
-        _body = datas.find("soap:Body")
-        _action = ET.SubElement(_body, f"ns2:{action}")
-        _action.set("xmlns:ns2", "http://ws.icl.veolia.com/")
-        for k, v in elts.items():
-            t = ET.SubElement(_action, k)
-            t.text = v
-
-        if not anonymous:
-            username_token = datas.find("soap:Header").find("wsse:Security").find("wsse:UsernameToken")
-            username_token.find("wsse:Username").text = self._email
-            username_token.find("wsse:Password").text = self.__tokenPassword
-
-        return ET.tostring(datas, encoding="UTF-8")
\ No newline at end of file
+        attributes = self._contract_attributes(abo_id)
+        history = attributes[DAILY][HISTORY]
+        with self.metrics.measure("merge"):
+            merged = history.update(records)
+            if merged:
+                attributes["last_index"] = history.last_index
+                attributes[AGGREGATES].update(history, since=merged[0][0])
+        if merged:
+            with self.metrics.measure("analytics"):
+                attributes[ANALYTICS] = analyze(history)
+            self.version += 1
+            await self._async_archive(abo_id, DAILY, merged)
+        _LOGGER.debug("%d readings merged into the history of %s", len(merged), abo_id)
+        return merged
@@ -1,32 +1,48 @@
 """
 Custom integration to integrate Veolia with Home Assistant.
+
+The client (VeoliaClient and the modules it uses) does not need Home
+Assistant: without it, the package only serves the client and the command
+line exporter, python -m veolia_water.
 """
+from __future__ import annotations
+
 import asyncio
-from datetime import timedelta
 import logging
 
-from homeassistant.config_entries import ConfigEntry
-from homeassistant.core import Config, HomeAssistant
-from homeassistant.exceptions import ConfigEntryNotReady
-from homeassistant.helpers.aiohttp_client import async_get_clientsession
-from homeassistant.helpers.update_coordinator import DataUpdateCoordinator, UpdateFailed
-
-from .VeoliaClient import VeoliaClient
-from .const import CONF_ABO_ID, CONF_PASSWORD, CONF_USERNAME, DOMAIN, PLATFORMS
-from .debug import decoratorexceptionDebug
-
-SCAN_INTERVAL = timedelta(hours=10)
+try:
+    from homeassistant.config_entries import ConfigEntry
+    from homeassistant.core import Config, HomeAssistant, callback
+    from homeassistant.exceptions import ConfigEntryNotReady
+    from homeassistant.helpers.aiohttp_client import async_get_clientsession
+    from homeassistant.helpers.storage import STORAGE_DIR
+except ImportError:
+    HomeAssistant = None
+
+    def callback(func):
+        """Stand for the Home Assistant decorator, the setup functions are not called without it."""
+        return func
+
+else:
+    from .VeoliaClient import VeoliaClient
+    from .archive import HistoryArchive
+    from .auth_cache import async_get_auth_cache
+    from .coordinator import VeoliaDataUpdateCoordinator
+
+from .const import ARCHIVE_DIR, CONF_ABO_ID, CONF_PASSWORD, CONF_USERNAME, DATA_HUBS, DOMAIN, PLATFORMS
+from .debug import trace
+from .hub import VeoliaHub
 
 _LOGGER = logging.getLogger(__name__)
 
 
-@decoratorexceptionDebug
+@trace
 async def async_setup(hass: HomeAssistant, config: Config):
     """Set up this integration using YAML is not supported."""
     return True
 
 
-@decoratorexceptionDebug
+@trace
 async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry):
     """Set up this integration using UI."""
     if hass.data.get(DOMAIN) is None:
@@ -36,13 +52,23 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry):
     password = entry.data.get(CONF_PASSWORD)
     abo_id = entry.data.get(CONF_ABO_ID)
     # _LOGGER.debug(f"abo_id={abo_id}")
-    session = async_get_clientsession(hass)
-    client = VeoliaClient(username, password, session, abo_id)
-    coordinator = VeoliaDataUpdateCoordinator(hass, client=client)
-    await coordinator.async_refresh()
-
-    if not coordinator.last_update_success:
-        raise ConfigEntryNotReady
+    hub = async_get_hub(hass, username, password)
+    hub.entries.add(entry.entry_id)
+    entry.async_on_unload(lambda: async_release_hub(hass, hub, entry.entry_id))
+    client = VeoliaClient(username, password, abo_id=abo_id, hub=hub)
+    auth_cache = await async_get_auth_cache(hass)
+    client.restore_auth_state(auth_cache.get(username))
+    client.archive = HistoryArchive(hass.config.path(STORAGE_DIR, ARCHIVE_DIR))
+    entry.async_on_unload(lambda: hass.async_add_executor_job(client.archive.close))
+    coordinator = VeoliaDataUpdateCoordinator(hass, client=client, auth_cache=auth_cache, entry_id=entry.entry_id)
+    await coordinator.async_restore_schedule()
+    if await coordinator.async_restore_snapshot():
+        # The entities show the last data at once, Veolia is not waited for
+        entry.async_create_background_task(hass, coordinator.async_refresh(), f"{DOMAIN} refresh")
+    else:
+        await coordinator.async_refresh()
+        if not coordinator.last_update_success:
+            raise ConfigEntryNotReady
 
     hass.data[DOMAIN][entry.entry_id] = coordinator
 
@@ -52,31 +78,37 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry):
             hass.async_add_job(hass.config_entries.async_forward_entry_setup(entry, platform))
 
     entry.async_on_unload(entry.add_update_listener(async_reload_entry))
+    entry.async_create_background_task(hass, coordinator.async_backfill(), f"{DOMAIN} backfill")
     return True
 
 
-class VeoliaDataUpdateCoordinator(DataUpdateCoordinator):
-    """Class to manage fetching data from the API."""
-
-    def __init__(self, hass: HomeAssistant, client: VeoliaClient) -> None:
-        """Initialize."""
-        self.api = client
-        self.platforms = []
+@callback
+def async_get_hub(hass: HomeAssistant, username: str, password: str) -> VeoliaHub:
+    """Return the hub shared by the config entries of an account, created on first use.
 
-        super().__init__(hass, _LOGGER, name=DOMAIN, update_interval=SCAN_INTERVAL)
+    Only called from async_setup_entry, with the credentials of the entry: config flows check
+    the credentials typed on a hub of their own.
+    """
+    hubs = hass.data.setdefault(DOMAIN, {}).setdefault(DATA_HUBS, {})
+    hub = hubs.get(username.lower())
+    if hub is None:
+        hub = hubs[username.lower()] = VeoliaHub(username, password, async_get_clientsession(hass))
+    elif hub.password != password:
+        # new credentials: the token of the old ones is not kept
+        hub.password = password
+        hub.token = None
+    return hub
 
-    async def _async_update_data(self):
-        """Update data via library."""
-        try:
-            consumption = await self.hass.async_add_executor_job(self.api.update_all)
-            _LOGGER.debug(f"consumption = {consumption}")
-            return consumption
 
-        except Exception as exception:
-            raise UpdateFailed() from exception
+@callback
+def async_release_hub(hass: HomeAssistant, hub: VeoliaHub, entry_id: str) -> None:
+    """Forget the hub of an account once no config entry uses it."""
+    hub.entries.discard(entry_id)
+    if not hub.entries:
+        hass.data[DOMAIN].get(DATA_HUBS, {}).pop(hub.email.lower(), None)
 
 
-@decoratorexceptionDebug
+@trace
 async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry):
     """Handle removal of an entry."""
     coordinator = hass.data[DOMAIN][entry.entry_id]
@@ -95,8 +127,7 @@ async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry):
     return unloaded
 
 
-@decoratorexceptionDebug
+@trace
 async def async_reload_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
-    """Reload config entry."""
-    await async_unload_entry(hass, entry)
-    await async_setup_entry(hass, entry)
\ No newline at end of file
+    """Reload config entry, through Home Assistant so that the unload callbacks of the entry run."""
+    await hass.config_entries.async_reload(entry.entry_id)
\ No newline at end of file
@@ -0,0 +1,100 @@
+"""Export the consumption history of Veolia accounts, without Home Assistant.
+
+    python -m veolia_water --username user@example.com --format csv --output exports
+    python -m veolia_water --accounts accounts.json --format parquet --output exports --watermark watermark.json
+
+The password is read from VEOLIA_PASSWORD unless --password is given.  The
+accounts file is a JSON list of {"username", "password", "contracts"}, the
+contracts being optional.  Each period is written to <output>/<period>.<format>,
+or to the standard output with --output - (CSV and JSON Lines only).
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import logging
+import os
+import sys
+
+from .const import DAILY, MONTHLY
+from .export import FORMATS, CsvWriter, Exporter, JsonLinesWriter, ParquetWriter, Watermark
+
+_LOGGER = logging.getLogger(__package__)
+
+TEXT_WRITERS = {"csv": CsvWriter, "jsonl": JsonLinesWriter}
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    """Return the command line arguments."""
+    parser = argparse.ArgumentParser(prog="python -m veolia_water", description=__doc__.splitlines()[0])
+    parser.add_argument("--username", help="email of the account")
+    parser.add_argument("--password", default=os.environ.get("VEOLIA_PASSWORD"), help="default: $VEOLIA_PASSWORD")
+    parser.add_argument("--contract", action="append", dest="contracts", help="contract to export, default: all")
+    parser.add_argument("--accounts", help="JSON file of the accounts to export")
+    parser.add_argument("--format", choices=FORMATS, default="csv")
+    parser.add_argument("--output", default=".", help="directory of the files, or - for the standard output")
+    parser.add_argument("--period", choices=(DAILY, MONTHLY, "both"), default="both")
+    parser.add_argument("--watermark", help="JSON file of the last readings exported, for incremental exports")
+    parser.add_argument("--concurrency", type=int, default=4, help="accounts and contracts fetched at the same time")
+    parser.add_argument("--verbose", "-v", action="store_true")
+    args = parser.parse_args(argv)
+    if args.accounts is None and (args.username is None or args.password is None):
+        parser.error("--username and --password (or VEOLIA_PASSWORD) are required without --accounts")
+    if args.output == "-" and args.format == "parquet":
+        parser.error("Parquet cannot be written to the standard output")
+    return args
+
+
+def load_accounts(args: argparse.Namespace) -> list:
+    """Return the accounts to export."""
+    if args.accounts is None:
+        return [{"username": args.username, "password": args.password, "contracts": args.contracts}]
+    with open(args.accounts, encoding="utf-8") as file:
+        return json.load(file)
+
+
+def open_writers(args: argparse.Namespace, periods: tuple, stack: contextlib.ExitStack) -> dict:
+    """Open a writer by period, closed by the stack."""
+    if args.output == "-":
+        writer = TEXT_WRITERS[args.format](sys.stdout)
+        return dict.fromkeys(periods, writer)
+    os.makedirs(args.output, exist_ok=True)
+    writers = {}
+    for period in periods:
+        path = os.path.join(args.output, f"{period}.{args.format}")
+        if args.format == "parquet":
+            writer = ParquetWriter(path)
+        else:
+            writer = TEXT_WRITERS[args.format](stack.enter_context(open(path, "w", encoding="utf-8", newline="")))
+        # closed before its file
+        stack.callback(writer.close)
+        writers[period] = writer
+    return writers
+
+
+async def async_main(args: argparse.Namespace) -> int:
+    """Run the export, and return the exit status."""
+    periods = (DAILY, MONTHLY) if args.period == "both" else (args.period,)
+    with contextlib.ExitStack() as stack:
+        try:
+            writers = open_writers(args, periods, stack)
+        except ImportError:
+            _LOGGER.error("pyarrow is required to write Parquet files")
+            return 2
+        exporter = Exporter(writers, Watermark(args.watermark), periods, args.concurrency)
+        success = await exporter.async_export(load_accounts(args))
+    _LOGGER.info("%s readings exported", ", ".join(f"{count} {period}" for period, count in exporter.rows.items()))
+    return 0 if success else 1
+
+
+def main(argv=None) -> int:
+    """Entry point of python -m veolia_water."""
+    args = parse_args(argv)
+    logging.basicConfig(
+        level=logging.DEBUG if args.verbose else logging.INFO, format="%(asctime)s %(levelname)s %(name)s %(message)s"
+    )
+    return asyncio.run(async_main(args))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,113 @@
+"""Rolling aggregates of the daily consumption.
+
+The index keeps the prefix sums of the daily liters over contiguous days
+(days without reading count as zero), so any total between two dates is a
+difference of two entries.  It is extended incrementally after each fetch:
+only the last known day and the new ones are summed again.
+"""
+
+from array import array
+from bisect import bisect_left
+from datetime import date, timedelta
+
+from .history import DailyHistory
+
+
+class AggregateIndex:
+    """Prefix sums of a daily history."""
+
+    def __init__(self) -> None:
+        """Initialize an empty index."""
+        self._reset()
+
+    def _reset(self, first=None) -> None:
+        """Empty the index."""
+        self._first = first
+        # _prefix[i] is the total of the days before first + i
+        self._prefix = array("q", [0])
+        self._rows = 0
+        self._last_key = None
+
+    def update(self, history: DailyHistory, since: int | None = None) -> None:
+        """Bring the index up to date with the history.
+
+        Readings changed in place before the last indexed day are only seen
+        when since, the key of the first of them, is given.
+        """
+        keys = history.keys
+        liters = history.liters
+        if not keys:
+            self._reset()
+            return
+        rows = self._rows
+        if self._first != keys[0] or rows > len(keys) or (rows and keys[rows - 1] != self._last_key):
+            # history changed before the indexed days: rebuild
+            self._reset(keys[0])
+            rows = 0
+        elif since is not None:
+            # sum again from the first reading changed
+            rows = min(rows, bisect_left(keys, since) + 1)
+        start = max(rows - 1, 0)
+        first = self._first
+        prefix = self._prefix
+        del prefix[keys[start] - first + 1 :]
+        for i in range(start, len(keys)):
+            offset = keys[i] - first
+            while len(prefix) <= offset:
+                prefix.append(prefix[-1])
+            prefix.append(prefix[-1] + liters[i])
+        self._rows = len(keys)
+        self._last_key = keys[-1]
+
+    @property
+    def last_day(self) -> date | None:
+        """Return the day of the last reading."""
+        return date.fromordinal(self._last_key) if self._last_key is not None else None
+
+    def total(self, start: date, end: date) -> int | None:
+        """Return the liters from start to end, both included.
+
+        Returns None when the history does not reach back to start: the sum
+        of the days known would pass for a complete one.
+        """
+        if self._first is None or start.toordinal() < self._first:
+            return None
+        prefix = self._prefix
+        lo = min(start.toordinal() - self._first, len(prefix) - 1)
+        hi = min(max(end.toordinal() - self._first + 1, 0), len(prefix) - 1)
+        return prefix[hi] - prefix[lo] if hi > lo else 0
+
+    def last_days(self, days: int) -> int | None:
+        """Return the liters of the last days, up to the last reading, None if the history is shorter."""
+        end = self.last_day
+        if end is None:
+            return None
+        return self.total(end - timedelta(days=days - 1), end)
+
+    def daily_average(self, days: int) -> float | None:
+        """Return the daily average over the last days covered by the history."""
+        end = self.last_day
+        if end is None:
+            return None
+        covered = min(days, self._last_key - self._first + 1)
+        return round(self.total(end - timedelta(days=covered - 1), end) / covered, 1)
+
+    def month_to_date(self) -> int | None:
+        """Return the liters since the start of the month of the last reading."""
+        end = self.last_day
+        return self.total(end.replace(day=1), end) if end else None
+
+    def year_to_date(self) -> int | None:
+        """Return the liters since the start of the year of the last reading, None if the history starts later."""
+        end = self.last_day
+        return self.total(end.replace(month=1, day=1), end) if end else None
+
+    def same_period_last_year(self) -> int | None:
+        """Return the liters of the previous year, up to the same day as the last reading, None if unknown."""
+        end = self.last_day
+        if end is None:
+            return None
+        if end.month == 2 and end.day == 29:
+            end = end.replace(day=28)
+        end = end.replace(year=end.year - 1)
+        return self.total(end.replace(month=1, day=1), end)
@@ -0,0 +1,137 @@
+"""Anomaly detection over the daily history.
+
+The columns of a DailyHistory are viewed as NumPy arrays without copy and
+laid on a contiguous day grid, then every check is a vectorized pass:
+
+- leak: a continuous flow raises the consumption of every day, so the
+  lowest daily consumption of the last days rises well above its usual level
+- spike: a day far above the median of the days before it
+- meter reset: the meter index going backwards
+- missing days: days without reading between the first and the last one
+"""
+
+from datetime import date
+from typing import NamedTuple
+import warnings
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from .history import DailyHistory
+
+# Days whose lowest consumption is watched for a leak
+LEAK_DAYS = 7
+# Days of usual lowest consumption the leak check compares with
+LEAK_BASELINE_DAYS = 90
+# Rise of the lowest daily consumption flagged as a leak, about 4 l/h flowing all day
+LEAK_MIN_RISE = 100
+
+# Days of the rolling baseline of the spike check
+SPIKE_BASELINE_DAYS = 28
+# A spike is this many deviations above the baseline, and at least SPIKE_MIN_LITERS above it
+SPIKE_DEVIATIONS = 4
+SPIKE_MIN_LITERS = 200
+
+# Recent days reported in the details of the anomalies
+RECENT_DAYS = 30
+
+
+class Analysis(NamedTuple):
+    """Anomalies of a daily history."""
+
+    leak: bool
+    leak_floor: int | None
+    leak_baseline: float | None
+    spike: bool
+    spike_days: list
+    meter_reset: bool
+    reset_days: list
+    missing: bool
+    missing_days: list
+    missing_count: int
+
+    def as_attributes(self, kind: str) -> dict:
+        """Return the details of an anomaly, as state attributes."""
+        if kind == "leak":
+            return {"lowest_daily_consumption": self.leak_floor, "usual_lowest_daily_consumption": self.leak_baseline}
+        if kind == "spike":
+            return {"spike_days": self.spike_days}
+        if kind == "meter_reset":
+            return {"reset_days": self.reset_days}
+        return {"missing_days": self.missing_days, "missing_count": self.missing_count}
+
+
+def _days(first: int, offsets) -> list:
+    """Return the dates of day offsets from the first ordinal."""
+    return [date.fromordinal(first + int(offset)) for offset in offsets]
+
+
+def analyze(history: DailyHistory) -> Analysis | None:
+    """Look for anomalies in a daily history."""
+    if not history:
+        return None
+    with warnings.catch_warnings():
+        # windows without any reading have no median, they are just not compared
+        warnings.simplefilter("ignore", RuntimeWarning)
+        return _analyze(history)
+
+
+def _analyze(history: DailyHistory) -> Analysis:
+    """Run every check over a history which is not empty."""
+    keys = np.frombuffer(history.keys, dtype=np.intc)
+    liters = np.frombuffer(history.liters, dtype=np.intc)
+    indexes = np.frombuffer(history.indexes, dtype=np.intc)
+    first = int(keys[0])
+    offsets = keys - first
+    span = int(offsets[-1]) + 1
+
+    # Contiguous grid, the missing days are NaN
+    grid = np.full(span, np.nan)
+    grid[offsets] = liters
+    present = ~np.isnan(grid)
+    recent = max(span - RECENT_DAYS, 0)
+
+    missing_offsets = np.flatnonzero(~present)
+    missing_days = _days(first, missing_offsets[missing_offsets >= recent])
+
+    # Meter index going backwards between two readings
+    resets = np.flatnonzero(np.diff(indexes.astype(np.int64)) < 0) + 1
+    reset_days = _days(first, offsets[resets])
+
+    # Each recent day against the median and median absolute deviation of the days before it
+    spike_days = []
+    start = max(recent - SPIKE_BASELINE_DAYS, 0)
+    if span - start > SPIKE_BASELINE_DAYS:
+        windows = sliding_window_view(grid[start:-1], SPIKE_BASELINE_DAYS)
+        baseline = np.nanmedian(windows, axis=1)
+        deviation = np.nanmedian(np.abs(windows - baseline[:, None]), axis=1) * 1.4826
+        threshold = baseline + np.maximum(SPIKE_DEVIATIONS * deviation, SPIKE_MIN_LITERS)
+        spikes = np.flatnonzero(grid[start + SPIKE_BASELINE_DAYS :] > threshold) + start + SPIKE_BASELINE_DAYS
+        spike_days = _days(first, spikes)
+
+    # Lowest consumption of the last LEAK_DAYS against its usual level
+    leak_floor = leak_baseline = None
+    leak = False
+    if span >= LEAK_DAYS * 2:
+        start = max(span - LEAK_BASELINE_DAYS - 2 * LEAK_DAYS + 1, 0)
+        floors = np.nanmin(sliding_window_view(grid[start:], LEAK_DAYS), axis=1)
+        floor, usual = floors[-1], np.nanmedian(floors[:-LEAK_DAYS])
+        if not np.isnan(floor):
+            leak_floor = int(floor)
+        if not np.isnan(usual):
+            leak_baseline = round(float(usual), 1)
+        if leak_floor is not None and leak_baseline is not None:
+            leak = leak_floor > 0 and leak_floor >= leak_baseline + LEAK_MIN_RISE
+
+    return Analysis(
+        leak=leak,
+        leak_floor=leak_floor,
+        leak_baseline=leak_baseline,
+        spike=bool(spike_days) and spike_days[-1] == date.fromordinal(first + span - 1),
+        spike_days=spike_days,
+        meter_reset=bool(reset_days) and reset_days[-1].toordinal() >= first + recent,
+        reset_days=reset_days,
+        missing=bool(missing_days),
+        missing_days=missing_days,
+        missing_count=len(missing_offsets),
+    )
@@ -0,0 +1,136 @@
+"""On-disk SQLite archive of the consumption history.
+
+The Veolia service only returns a limited window of history; every reading
+seen is archived here so that it stays available once it left that window.
+There is one database file per contract.  Methods are blocking and meant to
+run in an executor.
+"""
+
+from datetime import date
+import logging
+import os
+import sqlite3
+import threading
+
+from .const import DAILY, MONTHLY
+
+_LOGGER = logging.getLogger(__name__)
+
+BATCH_SIZE = 500
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS consumption (
+    contract TEXT NOT NULL,
+    period TEXT NOT NULL,
+    date TEXT NOT NULL,
+    liters INTEGER NOT NULL,
+    meter_index INTEGER,
+    PRIMARY KEY (contract, period, date)
+) WITHOUT ROWID
+"""
+
+UPSERT = """
+INSERT INTO consumption (contract, period, date, liters, meter_index) VALUES (?, ?, ?, ?, ?)
+ON CONFLICT (contract, period, date) DO UPDATE SET liters = excluded.liters, meter_index = excluded.meter_index
+"""
+
+# strftime() formats of the aggregation buckets
+GROUPS = {"day": "%Y-%m-%d", "month": "%Y-%m", "year": "%Y"}
+
+
+def key_to_date(period: str, key: int) -> str:
+    """Return the ISO date of a history key, the first day of the month for monthly keys."""
+    if period == MONTHLY:
+        year, month = divmod(key, 12)
+        return f"{year:04d}-{month + 1:02d}-01"
+    return date.fromordinal(key).isoformat()
+
+
+class HistoryArchive:
+    """Consumption archive, one SQLite database per contract."""
+
+    def __init__(self, directory: str) -> None:
+        """Initialize the archive stored in directory."""
+        self.directory = directory
+        self._connections = {}
+        self._lock = threading.Lock()
+
+    def _connection(self, contract: str) -> sqlite3.Connection:
+        """Return the connection to the database of a contract, created on first use."""
+        connection = self._connections.get(contract)
+        if connection is None:
+            os.makedirs(self.directory, exist_ok=True)
+            connection = sqlite3.connect(os.path.join(self.directory, f"{contract}.db"), check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(SCHEMA)
+            self._connections[contract] = connection
+        return connection
+
+    def upsert(self, contract: str, period: str, rows) -> int:
+        """Insert or update history rows (key, liters[, index]) in batches.
+
+        Returns:
+            int: number of rows written
+        """
+        params = [
+            (contract, period, key_to_date(period, row[0]), row[1], row[2] if len(row) > 2 else None) for row in rows
+        ]
+        with self._lock:
+            connection = self._connection(contract)
+            with connection:
+                for i in range(0, len(params), BATCH_SIZE):
+                    connection.executemany(UPSERT, params[i : i + BATCH_SIZE])
+        _LOGGER.debug("%s rows archived for %s %s", len(params), contract, period)
+        return len(params)
+
+    def range(self, contract: str, period: str = DAILY, start: date | None = None, end: date | None = None) -> list:
+        """Return the (date, liters, index) readings from start to end (both included), oldest first."""
+        query = "SELECT date, liters, meter_index FROM consumption WHERE contract = ? AND period = ?"
+        query, params = self._bounds(query, [contract, period], start, end)
+        with self._lock:
+            rows = self._connection(contract).execute(f"{query} ORDER BY date", params).fetchall()
+        return [(date.fromisoformat(day), liters, index) for day, liters, index in rows]
+
+    def aggregate(
+        self, contract: str, group: str = "month", start: date | None = None, end: date | None = None
+    ) -> list:
+        """Aggregate the daily readings by day, month or year.
+
+        Returns:
+            list: (bucket, total, average, minimum, maximum, days) tuples, oldest first
+        """
+        query = (
+            f"SELECT strftime('{GROUPS[group]}', date) AS bucket, SUM(liters), AVG(liters), MIN(liters), MAX(liters),"
+            " COUNT(*) FROM consumption WHERE contract = ? AND period = ?"
+        )
+        query, params = self._bounds(query, [contract, DAILY], start, end)
+        with self._lock:
+            return self._connection(contract).execute(f"{query} GROUP BY bucket ORDER BY bucket", params).fetchall()
+
+    def last_date(self, contract: str, period: str = DAILY) -> date | None:
+        """Return the date of the last archived reading."""
+        with self._lock:
+            (day,) = (
+                self._connection(contract)
+                .execute("SELECT MAX(date) FROM consumption WHERE contract = ? AND period = ?", (contract, period))
+                .fetchone()
+            )
+        return date.fromisoformat(day) if day else None
+
+    @staticmethod
+    def _bounds(query: str, params: list, start: date | None, end: date | None):
+        """Add the date bounds to a query."""
+        if start is not None:
+            query += " AND date >= ?"
+            params.append(start.isoformat())
+        if end is not None:
+            query += " AND date <= ?"
+            params.append(end.isoformat())
+        return query, params
+
+    def close(self) -> None:
+        """Close every database."""
+        with self._lock:
+            for connection in self._connections.values():
+                connection.close()
+            self._connections.clear()
@@ -0,0 +1,48 @@
+"""Persistent cache of Veolia authentication tokens."""
+import logging
+
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.storage import Store
+
+from .const import DATA_AUTH_CACHE, DOMAIN, STORAGE_KEY_AUTH, STORAGE_VERSION
+
+_LOGGER = logging.getLogger(__name__)
+
+SAVE_DELAY = 10
+
+
+class VeoliaAuthCache:
+    """Tokens, resolved contract and contract list, keyed by account."""
+
+    def __init__(self, hass: HomeAssistant) -> None:
+        """Initialize the cache."""
+        self._store = Store(hass, STORAGE_VERSION, STORAGE_KEY_AUTH)
+        self._data = None
+
+    async def async_load(self):
+        """Load the cache from disk, only once."""
+        if self._data is None:
+            self._data = await self._store.async_load() or {}
+        return self._data
+
+    def get(self, account):
+        """Return the cached state of an account."""
+        return self._data.get(account)
+
+    def async_set(self, account, state):
+        """Store the state of an account, if it changed."""
+        if self._data.get(account) == state:
+            return
+        self._data[account] = state
+        self._store.async_delay_save(lambda: self._data, SAVE_DELAY)
+
+
+async def async_get_auth_cache(hass: HomeAssistant) -> VeoliaAuthCache:
+    """Return the loaded cache shared by every config entry."""
+    # the config flow of the first entry runs before anything was set up
+    domain_data = hass.data.setdefault(DOMAIN, {})
+    cache = domain_data.get(DATA_AUTH_CACHE)
+    if cache is None:
+        cache = domain_data[DATA_AUTH_CACHE] = VeoliaAuthCache(hass)
+    await cache.async_load()
+    return cache
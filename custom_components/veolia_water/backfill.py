@@ -0,0 +1,180 @@
+"""Backfill of the daily history older than the window the service returns.
+
+The days to import are split into chunks of BACKFILL_CHUNK_DAYS, fetched most
+recent first by a few concurrent workers, never starting more than
+BACKFILL_RATE calls per second.  Each chunk is merged into the history of the
+client as soon as it arrives, and marked done in a checkpoint which the caller
+stores, so an interrupted backfill resumes with the chunks left.  A chunk
+which keeps failing is skipped after BACKFILL_MAX_ATTEMPTS, it is tried again
+by the next run.  Once a chunk comes back empty the contract has no older
+reading, and the older chunks are not fetched.
+"""
+
+import asyncio
+from datetime import date, timedelta
+import logging
+import random
+import time
+
+_LOGGER = logging.getLogger(__name__)
+
+# Days fetched by one call
+BACKFILL_CHUNK_DAYS = 90
+# Chunks fetched at the same time, and calls started per second
+BACKFILL_CONCURRENCY = 2
+BACKFILL_RATE = 1.0
+# Attempts of a chunk before it is left to the next run, and the first delay between them
+BACKFILL_MAX_ATTEMPTS = 3
+BACKFILL_BACKOFF = 5.0
+
+
+class RateLimiter:
+    """Space the calls started, whatever the number of callers."""
+
+    def __init__(self, rate: float) -> None:
+        """Initialize a limiter letting rate calls start per second."""
+        self.interval = 1 / rate
+        self._next = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        """Wait for the next free slot."""
+        async with self._lock:
+            delay = self._next - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            self._next = max(self._next, time.monotonic()) + self.interval
+
+
+class BackfillJob:
+    """Backfill of the daily history of a contract, from start to end."""
+
+    def __init__(
+        self,
+        client,
+        abo_id: str,
+        limiter: RateLimiter | None = None,
+        chunk_days: int = BACKFILL_CHUNK_DAYS,
+        concurrency: int = BACKFILL_CONCURRENCY,
+        max_attempts: int = BACKFILL_MAX_ATTEMPTS,
+    ) -> None:
+        """Initialize a job with nothing planned; limiter may be shared by the jobs of an account."""
+        self.client = client
+        self.abo_id = abo_id
+        self.limiter = limiter or RateLimiter(BACKFILL_RATE)
+        self.chunk_days = chunk_days
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+        self.start = None
+        self.end = None
+        # Ordinals of the last day of the chunks done
+        self.done = set()
+        # Ordinal of the first day of the most recent chunk which came back empty
+        self.exhausted = None
+        self.failed = {}
+        self.merged = 0
+
+    def plan(self, start: date, end: date) -> None:
+        """Set the days to backfill, unless a restored checkpoint already did."""
+        if self.start is None:
+            self.start = start
+            self.end = end
+
+    def chunks(self) -> list:
+        """Return the (first day, last day) of every chunk, most recent first."""
+        chunks = []
+        last = self.end
+        while last >= self.start:
+            first = max(last - timedelta(days=self.chunk_days - 1), self.start)
+            chunks.append((first, last))
+            last = first - timedelta(days=1)
+        return chunks
+
+    def pending(self) -> list:
+        """Return the chunks left to fetch, most recent first."""
+        if self.start is None:
+            return []
+        return [
+            (first, last)
+            for first, last in self.chunks()
+            if last.toordinal() not in self.done and (self.exhausted is None or last.toordinal() >= self.exhausted)
+        ]
+
+    @property
+    def complete(self) -> bool:
+        """Return True when a plan exists and no chunk is left."""
+        return self.start is not None and not self.pending()
+
+    def as_dict(self) -> dict:
+        """Return the checkpoint to store."""
+        return {
+            "start": self.start.isoformat() if self.start else None,
+            "end": self.end.isoformat() if self.end else None,
+            "chunk_days": self.chunk_days,
+            "done": sorted(self.done),
+            "exhausted": self.exhausted,
+        }
+
+    def restore(self, data: dict | None) -> None:
+        """Resume from a stored checkpoint, unless its chunks differ."""
+        if not data or not data.get("start") or data.get("chunk_days") != self.chunk_days:
+            return
+        self.start = date.fromisoformat(data["start"])
+        self.end = date.fromisoformat(data["end"])
+        self.done = set(data["done"])
+        self.exhausted = data.get("exhausted")
+
+    async def async_run(self, on_checkpoint=None) -> bool:
+        """Fetch and merge the chunks left, calling on_checkpoint(job) after each one.
+
+        Returns:
+            bool: True if no chunk is left
+        """
+        pending = self.pending()
+        if not pending:
+            return self.complete
+        _LOGGER.info("Backfill of %s: %d chunks from %s to %s", self.abo_id, len(pending), self.start, self.end)
+        self.failed = {}
+        chunks = iter(pending)
+
+        async def worker():
+            # the workers share the iterator: each chunk is taken once
+            for chunk in chunks:
+                if self.exhausted is not None and chunk[1].toordinal() < self.exhausted:
+                    continue
+                if await self._async_run_chunk(*chunk) and on_checkpoint is not None:
+                    on_checkpoint(self)
+
+        await asyncio.gather(*[worker() for _ in range(min(self.concurrency, len(pending)))])
+        if self.failed:
+            _LOGGER.warning("Backfill of %s: %d chunks left for the next run", self.abo_id, len(self.failed))
+        return self.complete
+
+    async def _async_run_chunk(self, first: date, last: date) -> bool:
+        """Fetch a chunk, with retries, and merge it.
+
+        Returns:
+            bool: True if the chunk is done
+        """
+        metrics = self.client.metrics
+        for attempt in range(self.max_attempts):
+            if attempt:
+                await asyncio.sleep(random.uniform(0, BACKFILL_BACKOFF * 2 ** (attempt - 1)))
+            await self.limiter.acquire()
+            try:
+                with metrics.measure("backfill_chunk"):
+                    records = await self.client.async_fetch_range(self.abo_id, first, last)
+            except Exception as error:  # pylint: disable=broad-except
+                metrics.error("backfill_failed")
+                _LOGGER.debug("Backfill of %s from %s to %s failed: %s", self.abo_id, first, last, error)
+                self.failed[last.toordinal()] = error
+                continue
+            self.failed.pop(last.toordinal(), None)
+            # the service may answer with more than the range asked
+            records = [record for record in records if first <= record.date <= last]
+            if not records:
+                self.exhausted = max(self.exhausted or 0, first.toordinal())
+            self.merged += len(await self.client.async_merge_history(self.abo_id, records))
+            self.done.add(last.toordinal())
+            return True
+        return False
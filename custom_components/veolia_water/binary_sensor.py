@@ -0,0 +1,60 @@
+"""Binary sensor platform for Veolia."""
+
+from homeassistant.components.binary_sensor import BinarySensorDeviceClass, BinarySensorEntity
+
+from .const import ANALYTICS, BINARY_SENSOR, DOMAIN
+from .debug import trace
+from .entity import VeoliaBaseEntity, async_add_contract_entities
+
+# Anomaly sensors: name suffix -> (device class, field of the Analysis)
+ANOMALY_SENSORS = {
+    "leak": (BinarySensorDeviceClass.MOISTURE, "leak"),
+    "spike": (BinarySensorDeviceClass.PROBLEM, "spike"),
+    "meter_reset": (BinarySensorDeviceClass.PROBLEM, "meter_reset"),
+    "missing_days": (BinarySensorDeviceClass.PROBLEM, "missing"),
+}
+
+
+async def async_setup_entry(hass, entry, async_add_devices):
+    """Set up binary sensor platform."""
+    coordinator = hass.data[DOMAIN][entry.entry_id]
+    async_add_contract_entities(
+        hass,
+        entry,
+        coordinator,
+        async_add_devices,
+        BINARY_SENSOR,
+        lambda abo_id: [VeoliaAnomalyBinarySensor(coordinator, entry, abo_id, kind) for kind in ANOMALY_SENSORS],
+    )
+
+
+class VeoliaAnomalyBinarySensor(VeoliaBaseEntity, BinarySensorEntity):
+    """Tells whether the daily readings show an anomaly."""
+
+    @trace
+    def __init__(self, coordinator, config_entry, abo_id, kind):
+        """Initialize the sensor of one of ANOMALY_SENSORS."""
+        super().__init__(coordinator, config_entry, abo_id)
+        self.kind = self.key = kind
+
+    @property
+    def device_class(self):
+        """Return the device_class of the sensor."""
+        return ANOMALY_SENSORS[self.kind][0]
+
+    @property
+    def icon(self):
+        """Return the icon of the device class."""
+        return None
+
+    @trace
+    def _update_cache(self):
+        """Tell whether the anomaly is found in the last readings, with its details."""
+        analysis = self.contract_data[ANALYTICS]
+        attrs = self._base_extra_state_attributes()
+        if analysis is None:
+            self._attr_is_on = None
+        else:
+            self._attr_is_on = getattr(analysis, ANOMALY_SENSORS[self.kind][1])
+            attrs |= analysis.as_attributes(self.kind)
+        self._attr_extra_state_attributes = attrs
@@ -0,0 +1,86 @@
+"""Capture of the last SOAP exchanges, for diagnostics.
+
+The last exchanges are kept in a ring buffer, their bodies cut after
+MAX_BODY_BYTES.  Credentials, tokens and emails are only redacted when the
+exchanges are exported, so capturing costs a few slices per call.
+"""
+
+from collections import deque
+from datetime import datetime, timezone
+import re
+
+# Exchanges kept
+MAX_EXCHANGES = 10
+# Bytes kept of each request and response body
+MAX_BODY_BYTES = 16 * 1024
+
+REDACTED = b"**REDACTED**"
+
+# Elements holding the email, the password or the token, and such an element cut by the truncation
+_SECRET_RE = re.compile(rb"<((?:\w+:)?(?:Username|Password|Nonce|cptEmail|cptPwd))(\s[^>]*)?>[^<]*(?:</\1>|\Z)")
+
+
+def _redact_element(match: re.Match) -> bytes:
+    name = match.group(1)
+    return b"<%s%s>%s</%s>" % (name, match.group(2) or b"", REDACTED, name)
+
+
+def redact(body: bytes) -> str:
+    """Return a body without credentials, as text."""
+    return _SECRET_RE.sub(_redact_element, body).decode("utf-8", "replace")
+
+
+class BodyCapture:
+    """Beginning of a body read chunk by chunk."""
+
+    __slots__ = ("_chunks", "_kept", "size")
+
+    def __init__(self) -> None:
+        """Initialize an empty capture."""
+        self._chunks = []
+        self._kept = 0
+        self.size = 0
+
+    def feed(self, chunk: bytes) -> None:
+        """Keep the chunk, as far as MAX_BODY_BYTES."""
+        self.size += len(chunk)
+        if self._kept < MAX_BODY_BYTES:
+            chunk = chunk[: MAX_BODY_BYTES - self._kept]
+            self._chunks.append(chunk)
+            self._kept += len(chunk)
+
+    @property
+    def data(self) -> bytes:
+        """Return the bytes kept."""
+        return b"".join(self._chunks)
+
+
+class ExchangeCapture:
+    """Ring buffer of the last exchanges with the service."""
+
+    def __init__(self, max_exchanges: int = MAX_EXCHANGES) -> None:
+        """Initialize an empty buffer."""
+        self.exchanges = deque(maxlen=max_exchanges)
+
+    def record(self, action: str, request: bytes, status, response: BodyCapture | None, elapsed: float) -> None:
+        """Keep an exchange; status is the HTTP status or the error which ended it."""
+        self.exchanges.append(
+            (datetime.now(timezone.utc), action, request[:MAX_BODY_BYTES], len(request), status, response, elapsed)
+        )
+
+    def as_list(self) -> list:
+        """Return the exchanges, oldest first, redacted."""
+        return [
+            {
+                "time": time.isoformat(),
+                "action": action,
+                "status": status if isinstance(status, int) else repr(status),
+                "duration_ms": round(elapsed * 1000, 1),
+                "request_size": request_size,
+                "request": redact(request),
+                "response_size": response.size if response else None,
+                "response": redact(response.data) if response else None,
+                "truncated": bool(response) and response.size > MAX_BODY_BYTES,
+            }
+            for time, action, request, request_size, status, response, elapsed in self.exchanges
+        ]
@@ -2,14 +2,20 @@
 import logging
 
 from homeassistant import config_entries
+from homeassistant.helpers.aiohttp_client import async_get_clientsession
 import voluptuous as vol
 
-from .VeoliaClient import BadCredentialsException, VeoliaClient
+from .auth_cache import async_get_auth_cache
 from .const import CONF_ABO_ID, CONF_PASSWORD, CONF_USERNAME, DOMAIN
-from .debug import decoratorexceptionDebug
+from .debug import trace
+from .hub import VeoliaHub
+from .transport import TransportError
 
 _LOGGER: logging.Logger = logging.getLogger(__package__)
 
+# Choice of the contract step which follows every contract of the account
+ALL_CONTRACTS = ""
+
 
 class VeoliaFlowHandler(config_entries.ConfigFlow, domain=DOMAIN):
     """Config flow for Veolia."""
@@ -17,37 +23,57 @@ class VeoliaFlowHandler(config_entries.ConfigFlow, domain=DOMAIN):
     VERSION = 1
     CONNECTION_CLASS = config_entries.CONN_CLASS_CLOUD_POLL
 
-    @decoratorexceptionDebug
+    @trace
     def __init__(self):
         """Initialize."""
         self._errors = {}
+        self._user_input = {}
+        self._contracts = []
 
-    @decoratorexceptionDebug
+    @trace
     async def async_step_user(self, user_input=None):
         """Handle a flow initialized by the user."""
         self._errors = {}
 
         if user_input is not None:
-            valid = await self._test_credentials(user_input[CONF_USERNAME], user_input[CONF_PASSWORD])
-            if valid:
-                if user_input[CONF_ABO_ID] != "":
-                    title = f"{user_input[CONF_USERNAME]} - {user_input[CONF_ABO_ID]}"
-                else:
-                    title = f"{user_input[CONF_USERNAME]}"
-                return self.async_create_entry(title=title, data=user_input)
-            else:
-                self._errors["base"] = "auth"
+            contracts = await self._test_credentials(user_input[CONF_USERNAME], user_input[CONF_PASSWORD])
+            if contracts is not None:
+                self._user_input = user_input
+                self._contracts = contracts
+                if len(contracts) > 1:
+                    return await self.async_step_contract()
+                return await self._async_create_entry(ALL_CONTRACTS)
 
             return await self._show_config_form(user_input)
 
         user_input = {}
         user_input[CONF_USERNAME] = ""
         user_input[CONF_PASSWORD] = ""
-        user_input[CONF_ABO_ID] = ""
 
         return await self._show_config_form(user_input)
 
-    @decoratorexceptionDebug
+    @trace
+    async def async_step_contract(self, user_input=None):
+        """Let the user pick the contract to follow, among those of the account."""
+        if user_input is not None:
+            return await self._async_create_entry(user_input[CONF_ABO_ID])
+
+        choices = {ALL_CONTRACTS: "All contracts"} | {abo_id: abo_id for abo_id in self._contracts}
+        return self.async_show_form(
+            step_id="contract",
+            data_schema=vol.Schema({vol.Required(CONF_ABO_ID, default=ALL_CONTRACTS): vol.In(choices)}),
+        )
+
+    async def _async_create_entry(self, abo_id):
+        """Create the entry of the contract, or of every contract of the account."""
+        username = self._user_input[CONF_USERNAME]
+        unique_id = f"{username.lower()}_{abo_id}"
+        await self.async_set_unique_id(unique_id)
+        self._abort_if_unique_id_configured()
+        title = f"{username} - {abo_id}" if abo_id != ALL_CONTRACTS else username
+        return self.async_create_entry(title=title, data=self._user_input | {CONF_ABO_ID: abo_id})
+
+    @trace
     async def _show_config_form(self, user_input):
         """Show the configuration form to edit location data."""
         return self.async_show_form(
@@ -56,22 +82,34 @@ class VeoliaFlowHandler(config_entries.ConfigFlow, domain=DOMAIN):
                 {
                     vol.Required(CONF_USERNAME, default=user_input[CONF_USERNAME]): str,
                     vol.Required(CONF_PASSWORD, default=user_input[CONF_PASSWORD]): str,
-                    vol.Optional(CONF_ABO_ID, default=user_input[CONF_ABO_ID]): str,
                 }
             ),
             errors=self._errors,
         )
 
-    @decoratorexceptionDebug
+    @trace
     async def _test_credentials(self, username, password):
-        """Return true if credentials is valid."""
+        """Return the contracts of the account if credentials is valid, else None.
+
+        The login goes through a hub of the flow, never through the hub of the
+        entries of the account: credentials typed here do not replace theirs.
+        Its token is cached, so that the entry set up next neither logs in
+        again nor looks for its contracts.
+        """
+        hub = VeoliaHub(username, password, async_get_clientsession(self.hass))
         try:
-            client = VeoliaClient(username, password)
-            await self.hass.async_add_executor_job(client.login)
-            return True
-        except BadCredentialsException:
-            pass
-        return False
+            contracts = await hub.async_login()
+        except TransportError as e:
+            _LOGGER.error("Veolia service unreachable : %s", e)
+            self._errors["base"] = "cannot_connect"
+            return None
+        except Exception as e:
+            _LOGGER.error("wrong authentication : %s", e)
+            self._errors["base"] = "auth"
+            return None
+        auth_cache = await async_get_auth_cache(self.hass)
+        auth_cache.async_set(username, hub.auth_state())
+        return contracts
 
 
 # Enregistrer le handler de flux de configuration
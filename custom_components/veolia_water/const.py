@@ -1,4 +1,6 @@
 """Constants for Veolia."""
+from datetime import timedelta
+
 # Base component constants
 NAME = "Veolia"
 DOMAIN = "veolia"
@@ -10,15 +12,43 @@ ICON = "mdi:water"
 
 # Platforms
 SENSOR = "sensor"
-PLATFORMS = [SENSOR]
+BINARY_SENSOR = "binary_sensor"
+PLATFORMS = [SENSOR, BINARY_SENSOR]
 
 # Configuration and options
 CONF_USERNAME = "username"
 CONF_PASSWORD = "password"
 CONF_ABO_ID = "abo_id"
 
+# Maximum number of SOAP calls in flight for one account
+MAX_CONCURRENT_REQUESTS = 4
+
+# Authentication token cache
+TOKEN_MAX_AGE = timedelta(hours=12)
+STORAGE_VERSION = 1
+STORAGE_KEY_AUTH = f"{DOMAIN}.auth"
+DATA_AUTH_CACHE = "auth_cache"
+# Hubs of the accounts, by lowercased email
+DATA_HUBS = "hubs"
+STORAGE_KEY_SCHEDULER = f"{DOMAIN}.scheduler"
+STORAGE_KEY_SNAPSHOT = f"{DOMAIN}.snapshot"
+
+# Years of daily history imported when a contract is added
+BACKFILL_YEARS = 3
+
+# Sent after a refresh which did not update the coordinator listeners
+SIGNAL_METRICS = f"{DOMAIN}_metrics_{{}}"
+
+# History archive, one SQLite database per contract under .storage
+ARCHIVE_DIR = f"{DOMAIN}_history"
+
 # API = "api"
 DAILY = "daily"
 MONTHLY = "monthly"
 HISTORY = "historyConsumption"
+AGGREGATES = "aggregates"
+ANALYTICS = "analytics"
+FRESHNESS = "freshness"
+# Readings kept in the history attribute, the full history goes to the statistics
+HISTORY_ATTRIBUTE_LENGTH = {DAILY: 7, MONTHLY: 12}
 FORMAT_DATE = "%Y-%m-%dT%H:%M:%S%z"
\ No newline at end of file
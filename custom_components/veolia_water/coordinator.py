@@ -0,0 +1,184 @@
+"""Coordinator of the refreshes of a config entry."""
+import asyncio
+from datetime import date, timedelta
+import logging
+
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.dispatcher import async_dispatcher_send
+from homeassistant.helpers.storage import Store
+from homeassistant.helpers.update_coordinator import DataUpdateCoordinator, UpdateFailed
+from homeassistant.util import dt as dt_util
+
+from .VeoliaClient import VeoliaClient
+from .auth_cache import VeoliaAuthCache
+from .backfill import BACKFILL_RATE, BackfillJob, RateLimiter
+from .const import (
+    BACKFILL_YEARS,
+    DAILY,
+    DOMAIN,
+    HISTORY,
+    MONTHLY,
+    SIGNAL_METRICS,
+    STORAGE_KEY_SCHEDULER,
+    STORAGE_KEY_SNAPSHOT,
+    STORAGE_VERSION,
+)
+from .scheduler import PublicationScheduler
+from .statistics import VeoliaStatisticsImporter
+
+_LOGGER = logging.getLogger(__name__)
+
+SCHEDULER_SAVE_DELAY = 10
+SNAPSHOT_SAVE_DELAY = 30
+
+
+class VeoliaDataUpdateCoordinator(DataUpdateCoordinator):
+    """Class to manage fetching data from the API."""
+
+    def __init__(self, hass: HomeAssistant, client: VeoliaClient, auth_cache: VeoliaAuthCache, entry_id: str) -> None:
+        """Initialize."""
+        self.api = client
+        self.entry_id = entry_id
+        self.auth_cache = auth_cache
+        self.statistics = VeoliaStatisticsImporter(hass)
+        self.scheduler = PublicationScheduler()
+        self._scheduler_store = Store(hass, STORAGE_VERSION, f"{STORAGE_KEY_SCHEDULER}.{entry_id}")
+        self._snapshot_store = Store(hass, STORAGE_VERSION, f"{STORAGE_KEY_SNAPSHOT}.{entry_id}")
+        # Backfill checkpoints by contract, stored in the snapshot with the readings they mark as done
+        self._backfill_checkpoints = {}
+        # Time of the refresh which brought the data shown, and whether it was only restored from the snapshot
+        self.data_time = None
+        self.stale = False
+        self.platforms = []
+        self._skip_listeners = False
+
+        super().__init__(hass, _LOGGER, name=DOMAIN, update_interval=self.scheduler.next_interval(dt_util.now()))
+
+    async def async_restore_schedule(self):
+        """Restore what the scheduler learned before the restart."""
+        self.scheduler.restore(await self._scheduler_store.async_load())
+        self.update_interval = self.scheduler.next_interval(dt_util.now())
+
+    async def async_restore_snapshot(self):
+        """Restore the data of the last successful refresh before the restart.
+
+        Returns:
+            bool: True if the entities can be set up with the restored data
+        """
+        snapshot = await self._snapshot_store.async_load()
+        if not snapshot:
+            return False
+        restored = self.api.restore_snapshot(snapshot["contracts"])
+        # the history of the contracts of the snapshot is restored either way, with their backfill
+        self._backfill_checkpoints = snapshot.get("backfill", {})
+        if not restored:
+            return False
+        self.api.hub.response_cache.restore(snapshot.get("responses"))
+        self.data_time = dt_util.parse_datetime(snapshot["time"])
+        self.stale = True
+        self.data = self.api.attributes
+        _LOGGER.debug("Data of %s restored, refreshing in the background", self.data_time)
+        return True
+
+    def _snapshot(self):
+        """Return the data to store, with the cached responses it was merged from."""
+        return {
+            "time": self.data_time.isoformat(),
+            "contracts": self.api.snapshot(),
+            "responses": self.api.hub.response_cache.as_dict(self.api.contracts),
+            "backfill": self._backfill_checkpoints,
+        }
+
+    async def _async_update_data(self):
+        """Update data via library."""
+        try:
+            with self.api.metrics.measure("refresh"):
+                consumption = await self.api.async_update_all()
+            # Nothing new published: entities already show this data, unless they show it as stale
+            self._skip_listeners = (
+                not self.api.changed and self.last_update_success and self.data is not None and not self.stale
+            )
+            if self.api.changed or self.stale or self.data_time is None:
+                self.data_time = dt_util.utcnow()
+            self.stale = False
+            if self.api.changed:
+                self._snapshot_store.async_delay_save(self._snapshot, SNAPSHOT_SAVE_DELAY)
+                self.hass.async_create_task(self._async_import_statistics())
+            self._schedule_next_poll()
+            return consumption
+
+        except Exception as exception:
+            self.api.metrics.error("refresh_failed")
+            self._schedule_next_poll(record=False)
+            raise UpdateFailed() from exception
+        finally:
+            self.auth_cache.async_set(self.api.account, self.api.auth_state())
+
+    def _schedule_next_poll(self, record=True):
+        """Learn from the last daily readings and set the delay before the next poll.
+
+        While the circuit breaker of the client is open, polls wait for it to let calls through.
+        """
+        now = dt_util.now()
+        if record:
+            # the reading of the day has arrived once it has for every contract
+            latest_days = [contract[DAILY][HISTORY].latest() for contract in self.api.attributes.values()]
+            latest_day = min((latest[0] for latest in latest_days if latest), default=None)
+            if self.scheduler.record(now, latest_day):
+                self._scheduler_store.async_delay_save(self.scheduler.as_dict, SCHEDULER_SAVE_DELAY)
+        breaker_delay = timedelta(seconds=self.api.transport.breaker.retry_after)
+        self.update_interval = max(self.scheduler.next_interval(now), breaker_delay)
+        _LOGGER.debug("Next poll in %s", self.update_interval)
+
+    async def async_backfill(self):
+        """Import the daily history of the last BACKFILL_YEARS of every contract, resuming the stored progress.
+
+        The checkpoints are stored in the snapshot of the data they were merged into, in one write.
+        """
+        checkpoints = self._backfill_checkpoints
+        limiter = RateLimiter(BACKFILL_RATE)
+        today = dt_util.now().date()
+
+        def save(job):
+            checkpoints[job.abo_id] = job.as_dict()
+            if self.data_time is not None:
+                self._snapshot_store.async_delay_save(self._snapshot, SNAPSHOT_SAVE_DELAY)
+
+        jobs = []
+        for abo_id in self.api.contracts:
+            job = BackfillJob(self.api, abo_id, limiter)
+            job.restore(checkpoints.get(abo_id))
+            latest = self.api.attributes.get(abo_id, {}).get(DAILY, {}).get(HISTORY)
+            end = date.fromordinal(latest.keys[0]) - timedelta(days=1) if latest else today
+            job.plan(today.replace(year=today.year - BACKFILL_YEARS), end)
+            if not job.complete:
+                jobs.append(job)
+        if not jobs:
+            return
+        await asyncio.gather(*[job.async_run(save) for job in jobs])
+        merged = [job for job in jobs if job.merged]
+        if not merged:
+            return
+        for job in merged:
+            self.statistics.reset(job.abo_id, DAILY)
+        await self._async_import_statistics()
+        self.async_update_listeners()
+
+    async def _async_import_statistics(self):
+        """Import the new readings of every contract into the long-term statistics."""
+        for abo_id, contract in self.api.attributes.items():
+            for period in (DAILY, MONTHLY):
+                await self.statistics.async_import(abo_id, period, contract[period][HISTORY])
+
+    @callback
+    def async_update_listeners(self) -> None:
+        """Update all registered listeners, unless the refresh brought nothing new.
+
+        The diagnostic sensors are told about every refresh, they show how it went.
+        """
+        if self._skip_listeners:
+            self._skip_listeners = False
+            _LOGGER.debug("No new readings, listeners not updated")
+            async_dispatcher_send(self.hass, SIGNAL_METRICS.format(self.entry_id))
+            return
+        super().async_update_listeners()
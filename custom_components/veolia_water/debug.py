@@ -1,17 +1,162 @@
+"""Tracing of the integration functions.
+
+``trace`` logs the start, end and errors of the functions it decorates.
+Nothing but two cached level checks is done while neither debug logging nor
+the aggregation is enabled, so it can wrap the entity properties which are
+read on every state write.
+
+Enabling debug on the ``<package>.trace`` logger (for instance with the
+``logger.set_level`` service) aggregates the call counts and durations of
+one call out of TRACE_SAMPLE_EVERY, by function; see TRACER.
+"""
+import functools
+import inspect
 import logging
+import time
+
+try:
+    from homeassistant.exceptions import HomeAssistantError
+except ImportError:
+    # without Home Assistant, nothing raises its control flow exceptions
+
+    class HomeAssistantError(Exception):
+        """Stand for the base of the Home Assistant exceptions."""
+
 
 _LOGGER = logging.getLogger(__name__)
+_TRACE_LOGGER = logging.getLogger(f"{__package__}.trace")
+
+# One call out of this many is timed into the aggregates
+TRACE_SAMPLE_EVERY = 10
+
+
+class TraceStats:
+    """Call counts and sampled durations, by function."""
+
+    def __init__(self, sample_every: int = TRACE_SAMPLE_EVERY) -> None:
+        """Initialize empty statistics."""
+        self.sample_every = sample_every
+        # name -> [calls, sampled, errors, total seconds, max seconds]
+        self.functions = {}
+
+    def tick(self, name: str) -> bool:
+        """Count a call, and return True if it is to be sampled."""
+        stats = self.functions.get(name)
+        if stats is None:
+            stats = self.functions[name] = [0, 0, 0, 0.0, 0.0]
+        stats[0] += 1
+        return (stats[0] - 1) % self.sample_every == 0
+
+    def record(self, name: str, elapsed: float, failed: bool) -> None:
+        """Add a sampled call."""
+        stats = self.functions[name]
+        stats[1] += 1
+        stats[2] += failed
+        stats[3] += elapsed
+        stats[4] = max(stats[4], elapsed)
+
+    def as_dict(self) -> dict:
+        """Return the statistics, durations in milliseconds, for diagnostics."""
+        return {
+            name: {
+                "calls": calls,
+                "sampled": sampled,
+                "errors": errors,
+                "mean_ms": round(total * 1000 / sampled, 3) if sampled else None,
+                "max_ms": round(longest * 1000, 3),
+            }
+            for name, (calls, sampled, errors, total, longest) in sorted(self.functions.items())
+        }
+
+
+TRACER = TraceStats()
+
+
+def _tracing(name: str) -> tuple[bool, bool]:
+    """Return whether to log and whether to sample a call."""
+    log = _LOGGER.isEnabledFor(logging.DEBUG)
+    sample = _TRACE_LOGGER.isEnabledFor(logging.DEBUG) and TRACER.tick(name)
+    return log, sample
+
+
+def _log_error(name: str, error: Exception) -> None:
+    """Log the error of a traced function.
+
+    Home Assistant exceptions are how coroutines talk to it (flow aborts,
+    ConfigEntryNotReady): they are not errors of the integration.
+    """
+    if isinstance(error, HomeAssistantError):
+        _LOGGER.debug("%s raised %s: %s", name, type(error).__name__, error)
+    else:
+        _LOGGER.error("Error in function %s: %s", name, error)
+
+
+def trace(func):
+    """Trace a function or a coroutine function.
+
+    Errors of functions, like entity properties, are logged and None is
+    returned.  Errors of coroutines are logged and raised again, Home
+    Assistant relies on them (ConfigEntryNotReady, flow aborts).
+    """
+    name = func.__qualname__
+    debug = _LOGGER.isEnabledFor
+    aggregate = _TRACE_LOGGER.isEnabledFor
+
+    if inspect.iscoroutinefunction(func):
+
+        @functools.wraps(func)
+        async def async_traced(*args, **kwargs):
+            if not (debug(logging.DEBUG) or aggregate(logging.DEBUG)):
+                try:
+                    return await func(*args, **kwargs)
+                except Exception as e:
+                    _log_error(name, e)
+                    raise
+            log, sample = _tracing(name)
+            if log:
+                _LOGGER.debug("Start function %s", name)
+            start = time.perf_counter()
+            failed = True
+            try:
+                result = await func(*args, **kwargs)
+                failed = False
+                return result
+            except Exception as e:
+                _log_error(name, e)
+                raise
+            finally:
+                elapsed = time.perf_counter() - start
+                if sample:
+                    TRACER.record(name, elapsed, failed)
+                if log:
+                    _LOGGER.debug("End function %s in %.1f ms", name, elapsed * 1000)
 
+        return async_traced
 
-def decoratorexceptionDebug(f):
-    def decoratorfunction(*args, **kwargs):
+    @functools.wraps(func)
+    def traced(*args, **kwargs):
+        if not (debug(logging.DEBUG) or aggregate(logging.DEBUG)):
+            try:
+                return func(*args, **kwargs)
+            except Exception as e:
+                _LOGGER.error("Error in function %s: %s", name, e)
+                return None
+        log, sample = _tracing(name)
+        if log:
+            _LOGGER.debug("Start function %s", name)
+        start = time.perf_counter()
+        failed = True
         result = None
         try:
-            _LOGGER.debug(f"Start function {f.__name__}")
-            result = f(*args, **kwargs)
-            _LOGGER.debug(f"End function {f.__name__}")
+            result = func(*args, **kwargs)
+            failed = False
         except Exception as e:
-            _LOGGER.error(f"Error in function {f.__name__}: {e}")
+            _LOGGER.error("Error in function %s: %s", name, e)
+        elapsed = time.perf_counter() - start
+        if sample:
+            TRACER.record(name, elapsed, failed)
+        if log:
+            _LOGGER.debug("End function %s in %.1f ms", name, elapsed * 1000)
         return result
 
-    return decoratorfunction
\ No newline at end of file
+    return traced
@@ -0,0 +1,154 @@
+"""Streaming decoder of the Veolia ICL SOAP responses.
+
+Responses are fed to expat chunk by chunk as they come from the network.
+Only the leaves of the ``return`` elements which are asked for are kept,
+and every ``return`` record is converted to a typed tuple as soon as it is
+closed, so no intermediate document or dict tree is ever built.
+"""
+
+from datetime import date
+import time
+from typing import NamedTuple
+from xml.parsers import expat
+
+
+class DailyRecord(NamedTuple):
+    """Daily reading."""
+
+    date: date
+    liters: int
+    index: int
+
+
+class MonthlyRecord(NamedTuple):
+    """Monthly consumption."""
+
+    year: int
+    month: int
+    liters: int
+
+
+def daily_record(fields: dict) -> DailyRecord:
+    """Convert the leaves of a getConsommationJournaliere record."""
+    # dateReleve is like 2022-11-22T00:00:00+01:00, the date part is enough
+    return DailyRecord(
+        date.fromisoformat(fields["dateReleve"][:10]),
+        int(fields["consommation"]),
+        int(fields["index"]),
+    )
+
+
+def monthly_record(fields: dict) -> MonthlyRecord:
+    """Convert the leaves of a getConsommationMensuelle record."""
+    return MonthlyRecord(int(fields["annee"]), int(fields["mois"]), int(fields["consommation"]))
+
+
+def auth_record(fields: dict) -> dict:
+    """Convert the leaves of a getAuthentificationFront record."""
+    contracts = fields.get("listContrats/aboId", [])
+    return {
+        "token": fields.get("espaceClient/cptPwd"),
+        "contracts": contracts if isinstance(contracts, list) else [contracts],
+    }
+
+
+# Converter and leaves kept, by operation
+DECODERS = {
+    "getConsommationJournaliere": (daily_record, frozenset(("dateReleve", "consommation", "index"))),
+    "getConsommationMensuelle": (monthly_record, frozenset(("annee", "mois", "consommation"))),
+    "getAuthentificationFront": (auth_record, frozenset(("espaceClient/cptPwd", "listContrats/aboId"))),
+}
+
+FAULT_FIELDS = frozenset(("faultcode", "faultstring"))
+
+
+class ResponseDecoder:
+    """Incremental decoder of the response of one operation."""
+
+    def __init__(self, action: str) -> None:
+        """Initialize the decoder of an operation."""
+        self._convert, self._wanted = DECODERS[action]
+        self.records = []
+        self.fault = None
+        self.size = 0
+        # seconds spent decoding, as opposed to waiting for the network
+        self.parse_time = 0.0
+        # hash of the body, and whether the records come from the response cache
+        self.digest = None
+        self.unchanged = False
+        self._path = []
+        self._record_depth = None
+        self._fault_depth = None
+        self._fields = None
+        self._text = None
+        self._parser = expat.ParserCreate()
+        self._parser.buffer_text = True
+        self._parser.StartElementHandler = self._start
+        self._parser.EndElementHandler = self._end
+        self._parser.CharacterDataHandler = self._data
+
+    def feed(self, data: bytes) -> None:
+        """Decode a chunk of the response."""
+        start = time.perf_counter()
+        self.size += len(data)
+        self._parser.Parse(data, False)
+        self.parse_time += time.perf_counter() - start
+
+    def close(self) -> "ResponseDecoder":
+        """Finish decoding, raise ExpatError if the document is not complete."""
+        start = time.perf_counter()
+        try:
+            self._parser.Parse(b"", True)
+        finally:
+            self.parse_time += time.perf_counter() - start
+        return self
+
+    def _start(self, name, attrs):
+        local = name.rpartition(":")[2]
+        path = self._path
+        path.append(local)
+        if self._fields is not None:
+            self._text = []
+        elif local == "return" and len(path) > 1 and path[-2].endswith("Response"):
+            self._record_depth = len(path)
+            self._fields = {}
+        elif local == "Fault":
+            self._fault_depth = len(path)
+            self._fields = {}
+
+    def _data(self, data):
+        if self._text is not None:
+            self._text.append(data)
+
+    def _end(self, name):
+        path = self._path
+        depth = len(path)
+        fields = self._fields
+        if fields is not None:
+            if depth == self._record_depth:
+                self.records.append(self._convert(fields))
+                self._fields = self._record_depth = None
+            elif depth == self._fault_depth:
+                self.fault = fields
+                self._fields = self._fault_depth = None
+            elif self._text is not None:
+                start = self._record_depth or self._fault_depth
+                key = "/".join(path[start:])
+                wanted = self._wanted if self._record_depth else FAULT_FIELDS
+                if key in wanted:
+                    value = "".join(self._text)
+                    if key in fields:
+                        # repeated leaf, like the aboId of every contract
+                        previous = fields[key]
+                        fields[key] = previous + [value] if isinstance(previous, list) else [previous, value]
+                    else:
+                        fields[key] = value
+            self._text = None
+        path.pop()
+
+
+def decode(action: str, data: bytes) -> ResponseDecoder:
+    """Decode a whole response."""
+    decoder = ResponseDecoder(action)
+    decoder.feed(data)
+    return decoder.close()
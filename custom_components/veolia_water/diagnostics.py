@@ -0,0 +1,34 @@
+"""Diagnostics support for Veolia."""
+
+from homeassistant.components.diagnostics import async_redact_data
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+
+from .const import CONF_PASSWORD, CONF_USERNAME, DAILY, DOMAIN, FRESHNESS, HISTORY, MONTHLY
+from .debug import TRACER
+
+TO_REDACT = {CONF_USERNAME, CONF_PASSWORD}
+
+
+async def async_get_config_entry_diagnostics(hass: HomeAssistant, entry: ConfigEntry) -> dict:
+    """Return the metrics and the state of the refreshes of a config entry."""
+    coordinator = hass.data[DOMAIN][entry.entry_id]
+    client = coordinator.api
+    return {
+        "entry": async_redact_data(dict(entry.data), TO_REDACT),
+        "last_update_success": coordinator.last_update_success,
+        "update_interval": str(coordinator.update_interval),
+        "metrics": client.metrics.as_dict(),
+        "circuit_breaker": client.transport.breaker.as_dict(),
+        "scheduler": coordinator.scheduler.as_dict(),
+        "trace": TRACER.as_dict(),
+        "exchanges": client.transport.capture.as_list(),
+        "failed_contracts": {abo_id: repr(error) for abo_id, error in client.failed_contracts.items()},
+        "contracts": {
+            abo_id: {
+                period: {"history_size": len(contract[period][HISTORY]), FRESHNESS: contract[period][FRESHNESS]}
+                for period in (DAILY, MONTHLY)
+            }
+            for abo_id, contract in client.attributes.items()
+        },
+    }
@@ -1,46 +1,130 @@
 """VeoliaEntity class."""
 from homeassistant.components.sensor import SensorDeviceClass, SensorEntity
 from homeassistant.const import VOLUME_CUBIC_METERS
+from homeassistant.core import callback
+from homeassistant.helpers import entity_registry as er
 from homeassistant.helpers.update_coordinator import CoordinatorEntity
 
 from .const import ATTRIBUTION, DAILY, DOMAIN, HISTORY, ICON, NAME
-from .debug import decoratorexceptionDebug
+from .debug import trace
 
 
-class VeoliaEntity(CoordinatorEntity, SensorEntity):
-    """Representation of a Veolia entity."""
+@callback
+def async_add_contract_entities(hass, entry, coordinator, async_add_entities, platform, create):
+    """Add the entities of every contract, then of the contracts the account gets later.
 
-    @decoratorexceptionDebug
-    def __init__(self, coordinator, config_entry):
-        """Initialize the entity."""
+    create(abo_id) returns the entities of a contract.  They are added once the
+    contract has data, on the first coordinator update bringing it.
+    """
+    added = set()
+
+    @callback
+    def async_add_new_contracts():
+        entities = []
+        for abo_id in coordinator.api.contracts:
+            if abo_id not in added and abo_id in coordinator.data:
+                added.add(abo_id)
+                entities += create(abo_id)
+        if entities:
+            async_migrate_unique_ids(hass, entry, platform, entities)
+            async_add_entities(entities)
+
+    async_add_new_contracts()
+    entry.async_on_unload(coordinator.async_add_listener(async_add_new_contracts))
+
+
+@callback
+def async_migrate_unique_ids(hass, entry, platform, entities):
+    """Move the registered entities from the unique ID built from their name to their stable one."""
+    registry = er.async_get(hass)
+    for entity in entities:
+        legacy = f"{entry.entry_id}_{entity.name}"
+        entity_id = registry.async_get_entity_id(platform, entry.domain, legacy)
+        if entity_id and not registry.async_get_entity_id(platform, entry.domain, entity.unique_id):
+            registry.async_update_entity(entity_id, new_unique_id=entity.unique_id)
+
+
+class VeoliaBaseEntity(CoordinatorEntity):
+    """Representation of a Veolia entity, of any platform.
+
+    The state and the attributes are computed by _update_cache once per
+    coordinator update which brought new data, and served from the _attr_
+    attributes in between.
+    """
+
+    _cache_key = None
+    # Identifies the entity among the ones of its contract, or of the account
+    key = None
+
+    @trace
+    def __init__(self, coordinator, config_entry, abo_id):
+        """Initialize the entity for one contract of the account, or for the account when abo_id is None."""
         super().__init__(coordinator)
         self.config_entry = config_entry
+        self.abo_id = abo_id
+
+    @property
+    def contract_suffix(self):
+        """Return the suffix of the name, empty when the entry follows a single contract as it used to."""
+        if self.abo_id is None or len(self.coordinator.api.contracts) == 1:
+            return ""
+        return f"_{self.abo_id}"
+
+    @property
+    def name(self):
+        """Return the name of the entity."""
+        return f"veolia_{self.key}{self.contract_suffix}"
+
+    async def async_added_to_hass(self):
+        """Compute the cached values before the first state write."""
+        await super().async_added_to_hass()
+        self._refresh_cache()
+
+    @callback
+    def _handle_coordinator_update(self):
+        """Compute the cached values, then write the state."""
+        self._refresh_cache()
+        super()._handle_coordinator_update()
+
+    def _refresh_cache(self):
+        """Compute the cached values again, unless the data did not change since."""
+        coordinator = self.coordinator
+        key = (coordinator.api.version, coordinator.stale)
+        if key != self._cache_key:
+            self._cache_key = key
+            self._update_cache()
+
+    def _update_cache(self):
+        """Compute the state and the extra state attributes from the coordinator data."""
+        pass
+
+    @property
+    def contract_data(self):
+        """Return the coordinator data of the contract."""
+        return self.coordinator.data[self.abo_id]
+
+    @property
+    def available(self):
+        """Return True if the last refresh succeeded, or while the restored data is shown."""
+        return super().available or self.coordinator.stale
 
     @property
     def unique_id(self):
-        """Return a unique ID to use for this entity."""
-        return f"{self.config_entry.entry_id}_{self.name}"
+        """Return a unique ID to use for this entity, which does not depend on the number of contracts."""
+        if self.abo_id is None:
+            return f"{self.config_entry.entry_id}_{self.key}"
+        return f"{self.config_entry.entry_id}_{self.abo_id}_{self.key}"
 
     @property
-    @decoratorexceptionDebug
+    @trace
     def device_info(self):
         """Return device registry information for this entity."""
         return {
-            "identifiers": {(DOMAIN, self.config_entry.entry_id)},
+            "identifiers": {(DOMAIN, f"{self.config_entry.entry_id}_{self.abo_id}")},
             "manufacturer": NAME,
-            "name": NAME,
+            "name": f"{NAME} {self.abo_id}",
         }
 
-    @property
-    def device_class(self):
-        """Return the device_class of the sensor."""
-        return SensorDeviceClass.WATER
-
-    @property
-    def unit_of_measurement(self):
-        """Return the unit_of_measurement of the sensor."""
-        return VOLUME_CUBIC_METERS
-
     @property
     def icon(self):
         """Return the icon of the sensor."""
@@ -51,5 +135,22 @@ class VeoliaEntity(CoordinatorEntity, SensorEntity):
         return {
             "attribution": ATTRIBUTION,
             "integration": DOMAIN,
-            "last_report": self.coordinator.data[DAILY][HISTORY][0][0],
+            "contract": self.abo_id,
+            "last_report": self.contract_data[DAILY][HISTORY].latest()[0],
+            "stale": self.coordinator.stale,
+            "data_time": self.coordinator.data_time,
         }
+
+
+class VeoliaEntity(VeoliaBaseEntity, SensorEntity):
+    """Representation of a Veolia sensor."""
+
+    @property
+    def device_class(self):
+        """Return the device_class of the sensor."""
+        return SensorDeviceClass.WATER
+
+    @property
+    def native_unit_of_measurement(self):
+        """Return the unit_of_measurement of the sensor."""
+        return VOLUME_CUBIC_METERS
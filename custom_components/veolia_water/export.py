@@ -0,0 +1,238 @@
+"""Export of the consumption history to CSV, JSON Lines or Parquet, without Home Assistant.
+
+The readings go through generators from the history of each contract to the
+writer, as soon as the contract is fetched: no list of every row is built,
+and the history of a contract is released once it is written.  A watermark
+keeps the last day, or month, exported by contract, so that the next export
+only writes from there.  The last exported reading is written again, its
+value may have changed since (the consumption of the open month grows until
+the month is closed).
+"""
+
+import asyncio
+from bisect import bisect_left
+import csv
+from datetime import date
+import json
+import logging
+import os
+
+from .VeoliaClient import VeoliaClient
+from .archive import key_to_date
+from .const import DAILY, HISTORY, MONTHLY
+from .hub import VeoliaHub
+
+_LOGGER = logging.getLogger(__name__)
+
+FIELDS = ("account", "contract", "period", "date", "liters", "index")
+FORMATS = ("csv", "jsonl", "parquet")
+# Rows written at once to a Parquet file
+PARQUET_BATCH_ROWS = 10000
+
+
+def date_to_key(period: str, day: str) -> int:
+    """Return the history key of an ISO date, as written by key_to_date."""
+    day = date.fromisoformat(day)
+    return day.toordinal() if period == DAILY else day.year * 12 + day.month - 1
+
+
+def iter_rows(account: str, abo_id: str, period: str, history, since: str | None = None):
+    """Yield the readings of a history as dicts, from the day, or month, since if any."""
+    keys = history.keys
+    liters = history.liters
+    indexes = history.indexes if period == DAILY else None
+    start = 0 if since is None else bisect_left(keys, date_to_key(period, since))
+    for i in range(start, len(keys)):
+        yield {
+            "account": account,
+            "contract": abo_id,
+            "period": period,
+            "date": key_to_date(period, keys[i]),
+            "liters": liters[i],
+            "index": indexes[i] if indexes is not None else None,
+        }
+
+
+class CsvWriter:
+    """Rows written to a CSV file, with a header."""
+
+    def __init__(self, stream) -> None:
+        """Initialize a writer on an open text stream."""
+        self._writer = csv.DictWriter(stream, FIELDS)
+        self._writer.writeheader()
+
+    def write(self, rows) -> int:
+        """Write rows, and return how many."""
+        count = 0
+        for row in rows:
+            self._writer.writerow(row)
+            count += 1
+        return count
+
+    def close(self) -> None:
+        """Nothing is buffered."""
+
+
+class JsonLinesWriter:
+    """Rows written as one JSON object per line."""
+
+    def __init__(self, stream) -> None:
+        """Initialize a writer on an open text stream."""
+        self._stream = stream
+
+    def write(self, rows) -> int:
+        """Write rows, and return how many."""
+        count = 0
+        for row in rows:
+            self._stream.write(json.dumps(row, separators=(",", ":")))
+            self._stream.write("\n")
+            count += 1
+        return count
+
+    def close(self) -> None:
+        """Nothing is buffered."""
+
+
+class ParquetWriter:
+    """Rows written to a Parquet file, by batches of PARQUET_BATCH_ROWS."""
+
+    def __init__(self, path: str) -> None:
+        """Initialize a writer of a Parquet file, raise ImportError without pyarrow."""
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        self._pa = pa
+        self._schema = pa.schema(
+            [
+                ("account", pa.string()),
+                ("contract", pa.string()),
+                ("period", pa.string()),
+                ("date", pa.string()),
+                ("liters", pa.int32()),
+                ("index", pa.int32()),
+            ]
+        )
+        self._writer = pq.ParquetWriter(path, self._schema)
+        self._batch = []
+
+    def write(self, rows) -> int:
+        """Write rows, and return how many."""
+        count = 0
+        for row in rows:
+            self._batch.append(row)
+            count += 1
+            if len(self._batch) >= PARQUET_BATCH_ROWS:
+                self._flush()
+        return count
+
+    def _flush(self) -> None:
+        """Write the rows buffered as a record batch."""
+        if self._batch:
+            self._writer.write_batch(self._pa.RecordBatch.from_pylist(self._batch, schema=self._schema))
+            self._batch = []
+
+    def close(self) -> None:
+        """Write the last rows and the footer of the file."""
+        self._flush()
+        self._writer.close()
+
+
+class Watermark:
+    """Last day, or month, exported by account, contract and period, stored as JSON."""
+
+    def __init__(self, path: str | None) -> None:
+        """Load the watermark file, if any."""
+        self.path = path
+        self._data = {}
+        if path and os.path.exists(path):
+            with open(path, encoding="utf-8") as file:
+                self._data = json.load(file)
+
+    def get(self, account: str, abo_id: str, period: str) -> str | None:
+        """Return the last date exported, or None to export everything."""
+        return self._data.get(account, {}).get(abo_id, {}).get(period)
+
+    def set(self, account: str, abo_id: str, period: str, day: str) -> None:
+        """Move the watermark of a contract."""
+        self._data.setdefault(account, {}).setdefault(abo_id, {})[period] = day
+
+    def save(self) -> None:
+        """Write the watermark file, replacing the previous one at once."""
+        if not self.path:
+            return
+        temporary = f"{self.path}.tmp"
+        with open(temporary, "w", encoding="utf-8") as file:
+            json.dump(self._data, file, indent=2, sort_keys=True)
+        os.replace(temporary, self.path)
+
+
+class Exporter:
+    """Fetch the contracts of accounts concurrently, and stream their history to writers by period."""
+
+    def __init__(self, writers: dict, watermark: Watermark, periods=(DAILY, MONTHLY), concurrency: int = 4) -> None:
+        """Initialize an exporter writing each period to writers[period]."""
+        self.writers = writers
+        self.watermark = watermark
+        self.periods = periods
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self.rows = dict.fromkeys(periods, 0)
+        self.failed = []
+
+    async def async_export(self, accounts) -> bool:
+        """Export the accounts, given as dicts with username, password and optional contracts.
+
+        Returns:
+            bool: True if every contract was exported
+        """
+        await asyncio.gather(*[self._async_export_account(account) for account in accounts])
+        self.watermark.save()
+        return not self.failed
+
+    async def _async_export_account(self, account: dict) -> None:
+        """Log in to an account, then fetch its contracts concurrently and write each one as soon as it is fetched."""
+        username = account["username"]
+        hub = VeoliaHub(username, account["password"])
+        try:
+            async with self._semaphore:
+                try:
+                    contracts = account.get("contracts") or await hub.async_login()
+                except Exception as error:  # pylint: disable=broad-except
+                    _LOGGER.error("Login of %s failed: %s", username, error)
+                    self.failed.append((username, None))
+                    return
+            fetches = [self._async_fetch(hub, abo_id) for abo_id in contracts]
+            for fetch in asyncio.as_completed(fetches):
+                client, abo_id, error = await fetch
+                if error is not None:
+                    _LOGGER.error("Fetch of contract %s of %s failed: %s", abo_id, username, error)
+                    self.failed.append((username, abo_id))
+                    continue
+                self._write(username, abo_id, client.attributes.pop(abo_id))
+        finally:
+            await hub.async_close_session()
+
+    async def _async_fetch(self, hub: VeoliaHub, abo_id: str):
+        """Fetch the daily and monthly history of a contract.
+
+        Returns:
+            tuple: client, contract, error if the fetch failed
+        """
+        client = VeoliaClient(hub.email, hub.password, abo_id=abo_id, hub=hub)
+        async with self._semaphore:
+            try:
+                await client.async_update_all()
+            except Exception as error:  # pylint: disable=broad-except
+                return client, abo_id, error
+        return client, abo_id, None
+
+    def _write(self, account: str, abo_id: str, attributes: dict) -> None:
+        """Write the history of a contract from its watermark, then move the watermark."""
+        for period in self.periods:
+            history = attributes[period][HISTORY]
+            since = self.watermark.get(account, abo_id, period)
+            count = self.writers[period].write(iter_rows(account, abo_id, period, history, since))
+            self.rows[period] += count
+            latest = history.keys[-1] if history else None
+            if latest is not None:
+                self.watermark.set(account, abo_id, period, key_to_date(period, latest))
+            _LOGGER.info("%s of %s: %d %s readings written", abo_id, account, count, period)
@@ -0,0 +1,220 @@
+"""Consumption history containers.
+
+Readings are kept sorted by key in ``array('i')`` columns (one machine int
+per value instead of a tuple of Python objects per reading).  Keys are day
+ordinals for the daily history and ``year * 12 + month - 1`` for the monthly
+one, so lookups and slices are bisections on the key column.
+"""
+
+from abc import ABC, abstractmethod
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import date
+
+from .decoder import DailyRecord, MonthlyRecord
+
+
+class ConsumptionHistory(ABC):
+    """Readings sorted by ascending key."""
+
+    # Names of the value columns, after the key column
+    COLUMNS = ("liters",)
+
+    def __init__(self) -> None:
+        """Initialize an empty history."""
+        self._keys = array("i")
+        self._values = tuple(array("i") for _ in self.COLUMNS)
+
+    @staticmethod
+    @abstractmethod
+    def encode(label) -> int:
+        """Return the key of a label."""
+
+    @staticmethod
+    @abstractmethod
+    def decode(key: int):
+        """Return the label of a key."""
+
+    @staticmethod
+    @abstractmethod
+    def row(record) -> tuple:
+        """Return the (key, *values) row of a decoded record."""
+
+    @classmethod
+    def from_records(cls, records):
+        """Return a history holding the decoded records."""
+        history = cls()
+        history.replace(records)
+        return history
+
+    @classmethod
+    def from_dict(cls, data: dict):
+        """Return the history stored by as_dict."""
+        history = cls()
+        history._keys = array("i", data["keys"])
+        history._values = tuple(array("i", data[column]) for column in cls.COLUMNS)
+        return history
+
+    def as_dict(self) -> dict:
+        """Return the columns as lists, to be stored as JSON."""
+        return {"keys": self._keys.tolist()} | {
+            column: values.tolist() for column, values in zip(self.COLUMNS, self._values)
+        }
+
+    def replace(self, records) -> None:
+        """Replace the content of the history by the decoded records."""
+        rows = {row[0]: row for row in map(self.row, records)}
+        self._set_rows(sorted(rows.values()))
+
+    def merge(self, records) -> list:
+        """Merge the readings which are not older than the last known one.
+
+        The last reading is updated in place if its values changed (the
+        consumption of the current month grows until the month is closed).
+
+        Returns:
+            list: (key, *values) rows which were added or changed
+        """
+        keys = self._keys
+        columns = self._values
+        last = keys[-1] if keys else None
+        rows = {row[0]: row for row in map(self.row, records) if last is None or row[0] >= last}
+        changed = []
+        for row in sorted(rows.values()):
+            if row[0] == last:
+                if all(column[-1] == value for column, value in zip(columns, row[1:])):
+                    continue
+                for column, value in zip(columns, row[1:]):
+                    column[-1] = value
+            else:
+                keys.append(row[0])
+                for column, value in zip(columns, row[1:]):
+                    column.append(value)
+            changed.append(row)
+        return changed
+
+    def update(self, records) -> list:
+        """Merge readings of any date, older than the known ones included.
+
+        The rows are merged in one pass: a batch of old readings costs one sort,
+        not one insertion per reading.
+
+        Returns:
+            list: (key, *values) rows which were added or changed
+        """
+        rows = dict(zip(self._keys, zip(self._keys, *self._values)))
+        changed = {}
+        for row in map(self.row, records):
+            if rows.get(row[0]) != row:
+                rows[row[0]] = changed[row[0]] = row
+        if changed:
+            self._set_rows(sorted(rows.values()))
+        return sorted(changed.values())
+
+    def _set_rows(self, rows) -> None:
+        """Replace the content by rows sorted by key."""
+        columns = tuple(zip(*rows)) or ((),) * (len(self.COLUMNS) + 1)
+        self._keys = array("i", columns[0])
+        self._values = tuple(array("i", column) for column in columns[1:])
+
+    def __len__(self) -> int:
+        """Return the number of readings."""
+        return len(self._keys)
+
+    def __bool__(self) -> bool:
+        """Return True if the history holds readings."""
+        return len(self._keys) > 0
+
+    def __eq__(self, other) -> bool:
+        """Compare the content of two histories."""
+        if not isinstance(other, ConsumptionHistory):
+            return NotImplemented
+        return type(self) is type(other) and self._keys == other._keys and self._values == other._values
+
+    @property
+    def keys(self) -> array:
+        """Return the key column."""
+        return self._keys
+
+    @property
+    def liters(self) -> array:
+        """Return the liters column."""
+        return self._values[0]
+
+    def get(self, label, default=None):
+        """Return the liters of a label, in O(log n)."""
+        key = self.encode(label)
+        i = bisect_left(self._keys, key)
+        if i < len(self._keys) and self._keys[i] == key:
+            return self._values[0][i]
+        return default
+
+    def slice(self, start=None, end=None):
+        """Return the readings from start to end (both included) as a new history."""
+        lo = 0 if start is None else bisect_left(self._keys, self.encode(start))
+        hi = len(self._keys) if end is None else bisect_right(self._keys, self.encode(end))
+        history = type(self)()
+        history._keys = self._keys[lo:hi]
+        history._values = tuple(column[lo:hi] for column in self._values)
+        return history
+
+    def latest(self):
+        """Return the last (label, liters), or None if empty."""
+        if not self._keys:
+            return None
+        return self.decode(self._keys[-1]), self._values[0][-1]
+
+    def to_tuples(self, limit=None) -> list:
+        """Return the readings as a list of (label, liters), most recent first."""
+        keys = self._keys
+        liters = self._values[0]
+        stop = -1 if limit is None else max(len(keys) - limit - 1, -1)
+        decode = self.decode
+        return [(decode(keys[i]), liters[i]) for i in range(len(keys) - 1, stop, -1)]
+
+
+class DailyHistory(ConsumptionHistory):
+    """Daily readings, keyed by day ordinal, with the meter index."""
+
+    COLUMNS = ("liters", "index")
+
+    encode = staticmethod(date.toordinal)
+    decode = staticmethod(date.fromordinal)
+
+    @staticmethod
+    def row(record: DailyRecord) -> tuple:
+        """Return the (ordinal, liters, index) row of a reading."""
+        return record.date.toordinal(), record.liters, record.index
+
+    @property
+    def indexes(self) -> array:
+        """Return the meter index column."""
+        return self._values[1]
+
+    @property
+    def last_index(self):
+        """Return the meter index after the last reading."""
+        if not self._keys:
+            return None
+        return self._values[1][-1] + self._values[0][-1]
+
+
+class MonthlyHistory(ConsumptionHistory):
+    """Monthly consumptions, keyed by year * 12 + month - 1, labelled "year-month"."""
+
+    @staticmethod
+    def encode(label) -> int:
+        """Return the key of a "year-month" label or a (year, month) tuple."""
+        year, month = label.split("-") if isinstance(label, str) else label
+        return int(year) * 12 + int(month) - 1
+
+    @staticmethod
+    def decode(key: int) -> str:
+        """Return the "year-month" label of a key."""
+        year, month = divmod(key, 12)
+        return f"{year}-{month + 1}"
+
+    @staticmethod
+    def row(record: MonthlyRecord) -> tuple:
+        """Return the (key, liters) row of a monthly consumption."""
+        return record.year * 12 + record.month - 1, record.liters
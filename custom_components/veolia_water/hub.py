@@ -0,0 +1,187 @@
+"""Authenticated access to the Veolia service, shared per account.
+
+One hub holds the token, the contract list, the transport (timeouts, retries,
+circuit breaker, metrics, capture) and the HTTP session of an account.  Every
+client of the account goes through it, so the account logs in once, and
+identical calls in flight at the same time (same operation, contract and
+token) go to the network once: every caller gets the same response.
+"""
+
+import asyncio
+import logging
+import time
+
+import aiohttp
+
+from .capture import ExchangeCapture
+from .const import MAX_CONCURRENT_REQUESTS, TOKEN_MAX_AGE
+from .metrics import ClientMetrics
+from .response_cache import ResponseCache
+from .soap import render_request
+from .transport import VeoliaTransport
+
+_LOGGER = logging.getLogger(__name__)
+
+ADDRESS = "https://www.service.eau.veolia.fr/icl-ws/iclWebService"
+HEADERS = {"Content-Type": "application/xml; charset=UTF-8"}
+
+
+class VeoliaError(Exception):
+    """Error from API."""
+
+    pass
+
+
+class VeoliaHub:
+    """Token, transport and session of an account."""
+
+    def __init__(self, email: str, password: str, session: aiohttp.ClientSession | None = None) -> None:
+        """Initialize the hub of an account.
+
+        The session is shared with the caller (Home Assistant passes its pooled
+        session); a private one is only opened when none is given.
+        """
+        self.email = email
+        self.password = password
+        self.metrics = ClientMetrics()
+        self.response_cache = ResponseCache()
+        self.transport = VeoliaTransport(
+            ADDRESS, HEADERS, metrics=self.metrics, capture=ExchangeCapture(), response_cache=self.response_cache
+        )
+        self.token = None
+        self.token_created = None
+        self.account_contracts = []
+        self._auth_lock = asyncio.Lock()
+        self._semaphore = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+        self._in_flight = {}
+        self.session = session
+        self._own_session = session is None
+        # Config entries using the hub
+        self.entries = set()
+
+    @property
+    def is_authenticated(self) -> bool:
+        """Return True when a token is known and not expired."""
+        return self.token is not None and time.time() - self.token_created < TOKEN_MAX_AGE.total_seconds()
+
+    def auth_state(self) -> dict | None:
+        """Return the authentication state to cache between restarts."""
+        if self.token is None:
+            return None
+        return {"token": self.token, "created": self.token_created, "contracts": self.account_contracts}
+
+    def restore_auth_state(self, state: dict | None) -> bool:
+        """Reuse a cached authentication state, unless it has expired."""
+        if not state or time.time() - state["created"] >= TOKEN_MAX_AGE.total_seconds():
+            return False
+        self.token = state["token"]
+        self.token_created = state["created"]
+        self.account_contracts = list(state["contracts"])
+        _LOGGER.debug("restored token, %d contracts", len(self.account_contracts))
+        return True
+
+    async def async_login(self, check_only: bool = False) -> list:
+        """Log in, and return the contracts of the account.
+
+        With check_only, the credentials are checked but the token is not kept.
+        """
+        datas = render_request("getAuthentificationFront", cptEmail=self.email, cptPwd=self.password)
+        with self.metrics.measure("auth"):
+            status, decoder = await self.async_post("getAuthentificationFront", datas)
+        _LOGGER.debug("getAuthentificationFront: HTTP %s, %d bytes", status, decoder.size)
+        if status != 200:
+            self.metrics.error("auth_failed")
+            _LOGGER.error("problem with authentication")
+            raise Exception(f"POST /__get_tokenPassword/ {status}")
+        if not decoder.records or decoder.records[0]["token"] is None:
+            raise VeoliaError("Issue with accessing data")
+        result = decoder.records[0]
+        if check_only:
+            return result["contracts"]
+        self.token = result["token"]
+        self.token_created = time.time()
+        self.account_contracts = result["contracts"]
+        return self.account_contracts
+
+    async def async_ensure_login(self) -> None:
+        """Log in unless a valid token is known, once for all the callers."""
+        if self.is_authenticated:
+            return
+        async with self._auth_lock:
+            if not self.is_authenticated:
+                await self.async_login()
+
+    async def async_reauthenticate(self, rejected_created) -> None:
+        """Log in again, once for all the calls which got the same token rejected."""
+        async with self._auth_lock:
+            if self.token_created == rejected_created:
+                _LOGGER.info("Token rejected, authenticating again")
+                self.token = None
+                await self.async_login()
+
+    async def async_post(self, action: str, datas: bytes, cache_key=None):
+        """Post a SOAP envelope through the transport, cached under cache_key if any.
+
+        Returns:
+            tuple: HTTP status code, decoder of the response
+        """
+        if self.session is None:
+            self.session = aiohttp.ClientSession()
+            self._own_session = True
+        return await self.transport.async_post(self.session, action, datas, cache_key)
+
+    async def async_call(self, action: str, abo_id: str, **values: str):
+        """Call a consumption operation of a contract, sharing the identical calls in flight.
+
+        Extra values are the other arguments of the operation (its date range).
+
+        Returns:
+            tuple: HTTP status code, decoder of the response
+        """
+        key = (action, abo_id, self.token, *sorted(values.items()))
+        call = self._in_flight.get(key)
+        if call is None:
+            call = self._in_flight[key] = asyncio.ensure_future(self._async_call(action, abo_id, values))
+            call.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        else:
+            self.metrics.event("coalesced")
+            _LOGGER.debug("%s of %s already in flight, sharing its response", action, abo_id)
+        # a cancelled caller does not cancel the call of the others
+        return await asyncio.shield(call)
+
+    async def _async_call(self, action, abo_id, values):
+        """Post a consumption request, at most MAX_CONCURRENT_REQUESTS at a time.
+
+        The responses of the polls are cached, not those of a date range which are fetched once.
+        """
+        datas = render_request(action, self.email, self.token, aboNum=abo_id, **values)
+        cache_key = None if values else (action, abo_id)
+        metrics = self.metrics
+        with metrics.measure("queue"):
+            await self._semaphore.acquire()
+        try:
+            start = time.perf_counter()
+            status, decoder = await self.async_post(action, datas, cache_key)
+        finally:
+            self._semaphore.release()
+        # the response is decoded while it is read: split the time between network and parsing
+        elapsed = time.perf_counter() - start
+        metrics.observe("http_ms", (elapsed - decoder.parse_time) * 1000)
+        metrics.observe("parse_ms", decoder.parse_time * 1000)
+        _LOGGER.debug(
+            "%s of %s: HTTP %s, %d bytes, %d records in %.0f ms (parsing %.0f ms)",
+            action,
+            abo_id,
+            status,
+            decoder.size,
+            len(decoder.records),
+            elapsed * 1000,
+            decoder.parse_time * 1000,
+        )
+        return status, decoder
+
+    async def async_close_session(self) -> None:
+        """Close current session if it is owned by the hub."""
+        if self._own_session and self.session is not None:
+            await self.session.close()
+        self.session = None
@@ -0,0 +1,98 @@
+"""Performance metrics of the refreshes.
+
+The duration of each phase of a refresh (authentication, HTTP round-trip,
+XML parsing, history merge, archive), the payload sizes and the record
+counts are kept in rolling windows, so that their percentiles follow the
+recent behaviour of the service.  Errors and other events are counted by kind.
+"""
+
+from collections import Counter, deque
+from contextlib import contextmanager
+import time
+
+# Samples kept by each histogram
+METRICS_WINDOW = 200
+
+
+class RollingHistogram:
+    """Percentiles of the last samples of a value."""
+
+    def __init__(self, size: int = METRICS_WINDOW) -> None:
+        """Initialize an empty histogram."""
+        self._samples = deque(maxlen=size)
+        self.count = 0
+        self.last = None
+
+    def add(self, value: float) -> None:
+        """Add a sample."""
+        self._samples.append(value)
+        self.count += 1
+        self.last = value
+
+    def percentile(self, percent: float) -> float | None:
+        """Return the nearest-rank percentile of the samples kept."""
+        if not self._samples:
+            return None
+        samples = sorted(self._samples)
+        return samples[min(int(len(samples) * percent / 100), len(samples) - 1)]
+
+    def as_dict(self) -> dict:
+        """Return the summary of the histogram."""
+        samples = self._samples
+        return {
+            "count": self.count,
+            "last": _round(self.last),
+            "p50": _round(self.percentile(50)),
+            "p95": _round(self.percentile(95)),
+            "max": _round(max(samples, default=None)),
+        }
+
+
+def _round(value):
+    return round(value, 1) if isinstance(value, float) else value
+
+
+class ClientMetrics:
+    """Histograms and error counters of a client and its coordinator."""
+
+    def __init__(self) -> None:
+        """Initialize empty metrics."""
+        self.histograms = {}
+        self.errors = Counter()
+        self.events = Counter()
+
+    def observe(self, name: str, value: float) -> None:
+        """Add a sample to the histogram of a metric."""
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            histogram = self.histograms[name] = RollingHistogram()
+        histogram.add(value)
+
+    @contextmanager
+    def measure(self, phase: str):
+        """Time a block, in milliseconds, into the histogram of phase_ms."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(f"{phase}_ms", (time.perf_counter() - start) * 1000)
+
+    def error(self, kind: str) -> None:
+        """Count an error."""
+        self.errors[kind] += 1
+
+    def event(self, kind: str) -> None:
+        """Count an event which is not an error."""
+        self.events[kind] += 1
+
+    def get(self, name: str) -> RollingHistogram | None:
+        """Return the histogram of a metric, if any sample was added."""
+        return self.histograms.get(name)
+
+    def as_dict(self) -> dict:
+        """Return every histogram and counter, for diagnostics."""
+        return {
+            "histograms": {name: histogram.as_dict() for name, histogram in sorted(self.histograms.items())},
+            "errors": dict(self.errors),
+            "events": dict(self.events),
+        }
@@ -0,0 +1,81 @@
+"""Decoded responses of the consumption calls, keyed by a hash of their body.
+
+Most polls get a response identical to the previous one.  The transport
+hashes the body while reading it and, when the digest is the one of the last
+response of the same operation and contract, returns the records decoded
+then instead of parsing the body again.  The cache keeps the last response
+of at most RESPONSE_CACHE_SIZE calls, and can be stored as JSON to work
+across restarts.
+"""
+
+from collections import OrderedDict
+from datetime import date
+import hashlib
+
+from .decoder import DailyRecord, MonthlyRecord
+
+# (operation, contract) responses kept
+RESPONSE_CACHE_SIZE = 32
+
+
+def body_hash():
+    """Return a new hash object of a response body."""
+    return hashlib.blake2b(digest_size=16)
+
+
+def _dump(record) -> list:
+    """Return a record as a JSON list."""
+    if isinstance(record, DailyRecord):
+        return [record.date.toordinal(), record.liters, record.index]
+    return list(record)
+
+
+def _load(action: str, row: list):
+    """Return the record of an operation stored by _dump."""
+    if action == "getConsommationJournaliere":
+        return DailyRecord(date.fromordinal(row[0]), row[1], row[2])
+    return MonthlyRecord(*row)
+
+
+class ResponseCache:
+    """Least recently used decoded responses, by (operation, contract)."""
+
+    def __init__(self, max_entries: int = RESPONSE_CACHE_SIZE) -> None:
+        """Initialize an empty cache."""
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+
+    def __contains__(self, key) -> bool:
+        """Return True if a response of the call is known."""
+        return key in self._entries
+
+    def get(self, key, digest: str) -> list | None:
+        """Return the records of the last response of a call, if its body had this digest."""
+        entry = self._entries.get(key)
+        if entry is None or entry[0] != digest:
+            return None
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    def put(self, key, digest: str, records: list) -> None:
+        """Keep the records of the last response of a call, dropping the least recently used one."""
+        self._entries[key] = (digest, records)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def as_dict(self, contracts=None) -> dict:
+        """Return the responses of the contracts, or of every contract, to be stored as JSON."""
+        return {
+            "entries": [
+                [action, abo_id, digest, [_dump(record) for record in records]]
+                for (action, abo_id), (digest, records) in self._entries.items()
+                if contracts is None or abo_id in contracts
+            ]
+        }
+
+    def restore(self, data: dict | None) -> None:
+        """Restore the responses returned by as_dict, unless newer ones are known."""
+        for action, abo_id, digest, rows in (data or {}).get("entries", []):
+            if (action, abo_id) not in self._entries:
+                self.put((action, abo_id), digest, [_load(action, row) for row in rows])
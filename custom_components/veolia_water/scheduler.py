@@ -0,0 +1,100 @@
+"""Adaptive polling schedule.
+
+Veolia publishes a new daily reading about once a day, at a time which is
+roughly the same from one day to the next.  The scheduler remembers when new
+readings showed up, polls densely around that time of day, backs off outside
+of it and stops for the day once the reading of the day has arrived.
+"""
+
+from collections import deque
+from datetime import date, datetime, timedelta
+import statistics
+
+# Arrival times remembered, in minutes since midnight
+ARRIVAL_SAMPLES = 14
+# Arrivals needed before the publication window is trusted
+MIN_SAMPLES = 3
+# Added around the observed arrival times
+WINDOW_MARGIN = timedelta(minutes=30)
+
+LEARNING_INTERVAL = timedelta(hours=3)
+DENSE_INTERVAL = timedelta(minutes=30)
+BACKOFF_INTERVAL = timedelta(hours=2)
+MIN_INTERVAL = timedelta(minutes=5)
+
+
+def _minutes(moment: datetime) -> int:
+    """Return the minutes since midnight."""
+    return moment.hour * 60 + moment.minute
+
+
+class PublicationScheduler:
+    """Learn when readings are published and tell when to poll next."""
+
+    def __init__(self) -> None:
+        """Initialize a scheduler which has not learned anything yet."""
+        self.arrivals = deque(maxlen=ARRIVAL_SAMPLES)
+        self.latest_day = None
+        self.arrived_on = None
+        self.last_poll = None
+
+    def record(self, now: datetime, latest_day: date | None) -> bool:
+        """Record a poll which found latest_day as the last reading.
+
+        Returns:
+            bool: True if a new reading arrived
+        """
+        previous_poll, self.last_poll = self.last_poll, now
+        if latest_day is None or (self.latest_day is not None and latest_day <= self.latest_day):
+            return False
+        known = self.latest_day is not None
+        self.latest_day = latest_day
+        self.arrived_on = now.date()
+        # Only learn from arrivals seen between two polls of the same day,
+        # not from the first poll after a restart which may find an old reading
+        if known and previous_poll is not None and previous_poll.date() == now.date():
+            arrival = previous_poll + (now - previous_poll) / 2
+            self.arrivals.append(_minutes(arrival))
+        return True
+
+    def window(self) -> tuple[int, int] | None:
+        """Return the publication window, in minutes since midnight."""
+        if len(self.arrivals) < MIN_SAMPLES:
+            return None
+        margin = WINDOW_MARGIN.total_seconds() // 60
+        cuts = statistics.quantiles(sorted(self.arrivals), n=10, method="inclusive")
+        return int(max(cuts[0] - margin, 0)), int(min(cuts[-1] + margin, 24 * 60 - 1))
+
+    def next_interval(self, now: datetime) -> timedelta:
+        """Return the delay before the next poll."""
+        window = self.window()
+        if window is None:
+            return LEARNING_INTERVAL
+        start, end = window
+        today = now.replace(hour=0, minute=0, second=0, microsecond=0)
+        window_start = today + timedelta(minutes=start)
+        if self.arrived_on == now.date():
+            return max(window_start + timedelta(days=1) - now, MIN_INTERVAL)
+        if now < window_start:
+            return max(window_start - now, MIN_INTERVAL)
+        if _minutes(now) <= end:
+            return DENSE_INTERVAL
+        return min(BACKOFF_INTERVAL, max(window_start + timedelta(days=1) - now, MIN_INTERVAL))
+
+    def as_dict(self) -> dict:
+        """Return the learned state, to be stored."""
+        return {
+            "arrivals": list(self.arrivals),
+            "latest_day": self.latest_day.isoformat() if self.latest_day else None,
+            "arrived_on": self.arrived_on.isoformat() if self.arrived_on else None,
+        }
+
+    def restore(self, data: dict | None) -> None:
+        """Restore the state returned by as_dict."""
+        if not data:
+            return
+        self.arrivals.extend(data.get("arrivals", []))
+        if data.get("latest_day"):
+            self.latest_day = date.fromisoformat(data["latest_day"])
+        if data.get("arrived_on"):
+            self.arrived_on = date.fromisoformat(data["arrived_on"])
@@ -2,31 +2,69 @@
 
 import logging
 from homeassistant.components.sensor import SensorStateClass, SensorDeviceClass
-from .const import DAILY, DOMAIN, HISTORY, MONTHLY
-from .debug import decoratorexceptionDebug
-from .entity import VeoliaEntity
+from homeassistant.const import EntityCategory, UnitOfTime, UnitOfVolume
+from homeassistant.helpers.dispatcher import async_dispatcher_connect
+from .const import (
+    AGGREGATES,
+    DAILY,
+    DOMAIN,
+    FRESHNESS,
+    HISTORY,
+    HISTORY_ATTRIBUTE_LENGTH,
+    MONTHLY,
+    NAME,
+    SENSOR,
+    SIGNAL_METRICS,
+)
+from .debug import trace
+from .entity import VeoliaEntity, async_add_contract_entities, async_migrate_unique_ids
+from .statistics import statistic_id
 
 _LOGGER = logging.getLogger(__name__)
 
+# Summary sensors: name suffix -> value read from the AggregateIndex
+AGGREGATE_SENSORS = {
+    "last_7_days": lambda index: index.last_days(7),
+    "last_30_days": lambda index: index.last_days(30),
+    "last_365_days": lambda index: index.last_days(365),
+    "daily_average": lambda index: index.daily_average(30),
+    "month_to_date": lambda index: index.month_to_date(),
+    "year_to_date": lambda index: index.year_to_date(),
+    "same_period_last_year": lambda index: index.same_period_last_year(),
+}
+
+# Diagnostic sensors: name suffix -> histogram of the client metrics
+METRIC_SENSORS = {
+    "refresh_duration": "refresh_ms",
+    "auth_duration": "auth_ms",
+    "http_duration": "http_ms",
+    "parse_duration": "parse_ms",
+    "merge_duration": "merge_ms",
+}
+
 
 async def async_setup_entry(hass, entry, async_add_devices):
     """Set up sensor platform."""
     coordinator = hass.data[DOMAIN][entry.entry_id]
-    sensors = [
-        VeoliaDailyUsageSensor(coordinator, entry),
-        VeoliaMonthlyUsageSensor(coordinator, entry),
-        VeoliaLastIndexSensor(coordinator, entry),
-    ]
+
+    def create(abo_id):
+        return [
+            VeoliaDailyUsageSensor(coordinator, entry, abo_id),
+            VeoliaMonthlyUsageSensor(coordinator, entry, abo_id),
+            VeoliaLastIndexSensor(coordinator, entry, abo_id),
+        ] + [VeoliaAggregateSensor(coordinator, entry, abo_id, kind) for kind in AGGREGATE_SENSORS]
+
+    async_add_contract_entities(hass, entry, coordinator, async_add_devices, SENSOR, create)
+    sensors = [VeoliaMetricSensor(coordinator, entry, kind) for kind in METRIC_SENSORS]
+    sensors.append(VeoliaErrorsSensor(coordinator, entry, "errors"))
+    async_migrate_unique_ids(hass, entry, SENSOR, sensors)
     async_add_devices(sensors)
 
 
 class VeoliaLastIndexSensor(VeoliaEntity):
     """Monitors the last index."""
 
-    @property
-    def name(self):
-        """Return the name of the sensor."""
-        return "veolia_last_index"
+    key = "last_index"
 
     @property
     def state_class(self):
@@ -39,33 +77,24 @@ class VeoliaLastIndexSensor(VeoliaEntity):
         return SensorDeviceClass.WATER
 
     @property
-    def unit_of_measurement(self):
+    def native_unit_of_measurement(self):
         """Return the unit_of_measurement of the sensor."""
         return "m³"
 
-    @property
-    @decoratorexceptionDebug
-    def state(self):
-        """Return the state of the sensor."""
-        state = self.coordinator.data["last_index"]
-        if state > 0:
-            return state
-        return None
-
-    @property
-    @decoratorexceptionDebug
-    def extra_state_attributes(self):
-        """Return the extra state attributes."""
-        return self._base_extra_state_attributes()
+    @trace
+    def _update_cache(self):
+        """Compute the state and the extra state attributes."""
+        state = self.contract_data["last_index"]
+        self._attr_native_value = state if state > 0 else None
+        self._attr_extra_state_attributes = self._base_extra_state_attributes()
 
 
 class VeoliaDailyUsageSensor(VeoliaEntity):
     """Monitors the daily water usage."""
 
-    @property
-    def name(self):
-        """Return the name of the sensor."""
-        return "veolia_daily_consumption"
+    # The recent readings are only a summary, the history is in the statistics
+    _unrecorded_attributes = frozenset({HISTORY})
+    key = "daily_consumption"
 
     @property
     def state_class(self):
@@ -78,36 +107,30 @@ class VeoliaDailyUsageSensor(VeoliaEntity):
         return SensorDeviceClass.WATER
 
     @property
-    def unit_of_measurement(self):
+    def native_unit_of_measurement(self):
         """Return the unit_of_measurement of the sensor."""
         return "m³"
 
-    @property
-    @decoratorexceptionDebug
-    def state(self):
-        """Return the state of the sensor."""
-        state = self.coordinator.data[DAILY][HISTORY][0][1]
-        if state > 0:
-            return state
-        return None
-
-    @property
-    @decoratorexceptionDebug
-    def extra_state_attributes(self):
-        """Return the extra state attributes."""
-        attrs = self._base_extra_state_attributes() | {
-            "historyConsumption": self.coordinator.data[DAILY][HISTORY],
+    @trace
+    def _update_cache(self):
+        """Compute the state and the extra state attributes."""
+        history = self.contract_data[DAILY][HISTORY]
+        state = history.latest()[1]
+        self._attr_native_value = state if state > 0 else None
+        self._attr_extra_state_attributes = self._base_extra_state_attributes() | {
+            "historyConsumption": history.to_tuples(HISTORY_ATTRIBUTE_LENGTH[DAILY]),
+            "history_size": len(history),
+            "statistic_id": statistic_id(self.abo_id, DAILY),
+            "freshness": dict(self.contract_data[DAILY][FRESHNESS]),
         }
-        return attrs
 
 
 class VeoliaMonthlyUsageSensor(VeoliaEntity):
     """Monitors the monthly water usage."""
 
-    @property
-    def name(self):
-        """Return the name of the sensor."""
-        return "veolia_monthly_consumption"
+    # The recent readings are only a summary, the history is in the statistics
+    _unrecorded_attributes = frozenset({HISTORY})
+    key = "monthly_consumption"
 
     @property
     def state_class(self):
@@ -120,23 +143,146 @@ class VeoliaMonthlyUsageSensor(VeoliaEntity):
         return SensorDeviceClass.WATER
 
     @property
-    def unit_of_measurement(self):
+    def native_unit_of_measurement(self):
         """Return the unit_of_measurement of the sensor."""
         return "m³"
 
+    @trace
+    def _update_cache(self):
+        """Compute the state and the extra state attributes."""
+        history = self.contract_data[MONTHLY][HISTORY]
+        state = history.latest()[1]
+        self._attr_native_value = state if state > 0 else None
+        self._attr_extra_state_attributes = self._base_extra_state_attributes() | {
+            "historyConsumption": history.to_tuples(HISTORY_ATTRIBUTE_LENGTH[MONTHLY]),
+            "history_size": len(history),
+            "statistic_id": statistic_id(self.abo_id, MONTHLY),
+            "freshness": dict(self.contract_data[MONTHLY][FRESHNESS]),
+        }
+
+
+class VeoliaAggregateSensor(VeoliaEntity):
+    """Monitors a summary of the daily water usage, in liters."""
+
+    @trace
+    def __init__(self, coordinator, config_entry, abo_id, kind):
+        """Initialize the sensor of one of AGGREGATE_SENSORS."""
+        super().__init__(coordinator, config_entry, abo_id)
+        self.kind = self.key = kind
+
+    @property
+    def device_class(self):
+        """Return the device_class of the sensor."""
+        # an average is a rate, not a volume
+        if self.kind == "daily_average":
+            return None
+        return SensorDeviceClass.WATER
+
+    @property
+    def native_unit_of_measurement(self):
+        """Return the unit_of_measurement of the sensor."""
+        if self.kind == "daily_average":
+            return f"{UnitOfVolume.LITERS}/d"
+        return UnitOfVolume.LITERS
+
+    @trace
+    def _update_cache(self):
+        """Compute the state and the extra state attributes."""
+        self._attr_native_value = AGGREGATE_SENSORS[self.kind](self.contract_data[AGGREGATES])
+        self._attr_extra_state_attributes = self._base_extra_state_attributes()
+
+
+class VeoliaMetricSensor(VeoliaEntity):
+    """Reports the duration of a phase of the refreshes, in milliseconds."""
+
+    _attr_entity_category = EntityCategory.DIAGNOSTIC
+
+    @trace
+    def __init__(self, coordinator, config_entry, kind):
+        """Initialize the sensor of one of METRIC_SENSORS, for the whole account."""
+        super().__init__(coordinator, config_entry, None)
+        self.kind = self.key = kind
+
+    async def async_added_to_hass(self):
+        """Also update the sensor after the refreshes which leave the other sensors alone."""
+        await super().async_added_to_hass()
+        self.async_on_remove(
+            async_dispatcher_connect(
+                self.hass, SIGNAL_METRICS.format(self.config_entry.entry_id), self.async_write_ha_state
+            )
+        )
+
     @property
-    def state(self):
-        """Return the state of the sensor."""
-        state = self.coordinator.data[MONTHLY][HISTORY][0][1]
-        if state > 0:
-            return state
+    def available(self):
+        """Return True, failed refreshes are measured too."""
+        return True
+
+    @property
+    @trace
+    def device_info(self):
+        """Return the device of the account, the metrics are not per contract."""
+        return {
+            "identifiers": {(DOMAIN, self.config_entry.entry_id)},
+            "manufacturer": NAME,
+            "name": f"{NAME} {self.coordinator.api.account}",
+        }
+
+    @property
+    def state_class(self):
+        """Return the state_class of the sensor."""
+        return SensorStateClass.MEASUREMENT
+
+    @property
+    def device_class(self):
+        """Return the device_class of the sensor."""
+        return SensorDeviceClass.DURATION
+
+    @property
+    def native_unit_of_measurement(self):
+        """Return the unit_of_measurement of the sensor."""
+        return UnitOfTime.MILLISECONDS
+
+    @property
+    @trace
+    def native_value(self):
+        """Return the duration of the last refresh, metrics change on every refresh."""
+        histogram = self.coordinator.api.metrics.get(METRIC_SENSORS[self.kind])
+        return histogram.as_dict()["last"] if histogram else None
+
+    @property
+    @trace
+    def extra_state_attributes(self):
+        """Return the percentiles over the last refreshes."""
+        histogram = self.coordinator.api.metrics.get(METRIC_SENSORS[self.kind])
+        return histogram.as_dict() if histogram else {}
+
+
+class VeoliaErrorsSensor(VeoliaMetricSensor):
+    """Counts the errors of the refreshes, by kind."""
+
+    @property
+    def state_class(self):
+        """Return the state_class of the sensor."""
+        return SensorStateClass.TOTAL_INCREASING
+
+    @property
+    def device_class(self):
+        """Return the device_class of the sensor."""
         return None
 
     @property
-    @decoratorexceptionDebug
+    def native_unit_of_measurement(self):
+        """Return the unit_of_measurement of the sensor."""
+        return None
+
+    @property
+    @trace
+    def native_value(self):
+        """Return the number of errors since the start."""
+        return sum(self.coordinator.api.metrics.errors.values())
+
+    @property
+    @trace
     def extra_state_attributes(self):
-        """Return the extra state attributes."""
-        attrs = self._base_extra_state_attributes() | {
-            "historyConsumption": self.coordinator.data[MONTHLY][HISTORY],
-        }
-        return attrs
+        """Return the errors by kind."""
+        return dict(self.coordinator.api.metrics.errors)
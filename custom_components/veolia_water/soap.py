@@ -0,0 +1,129 @@
+"""SOAP envelopes for the Veolia ICL web service.
+
+Each operation is rendered once, at import time, into constant byte chunks
+separated by the variable slots (username, password token, operation
+arguments and wsse:Created timestamp).  Building a request is then a join of
+escaped values between those chunks.
+"""
+
+from datetime import datetime, timezone
+import re
+from xml.sax.saxutils import escape
+import xml.etree.ElementTree as ET
+
+NS_SOAP = "http://schemas.xmlsoap.org/soap/envelope/"
+NS_XSI = "http://www.w3.org/2001/XMLSchema-instance"
+NS_WSSE = "http://docs.oasis-open.org/wss/2004/01/oasis-200401-wss-wssecurity-secext-1.0.xsd"
+NS_WSU = "http://docs.oasis-open.org/wss/2004/01/oasis-200401-wss-wssecurity-utility-1.0.xsd"
+NS_ICL = "http://ws.icl.veolia.com/"
+PASSWORD_TYPE = "http://docs.oasis-open.org/wss/2004/01/oasis-200401-wss-username-token-profile-1.0#PasswordText"
+NONCE_ENCODING = "http://docs.oasis-open.org/wss/2004/01/oasis-200401-wss-soap-message-security-1.0#Base64Binary"
+
+# Credentials of the anonymous access, used before authentication
+ANONYMOUS_USERNAME = "anonyme"
+ANONYMOUS_PASSWORD = "PYg6fMplCoo19dZVXkn2"
+NONCE = "1dWl+HzD/sJsWzAcDHQX6Q=="
+
+FORMAT_CREATED = "%Y-%m-%dT%H:%M:%S.%fZ"
+
+OPERATIONS = {
+    "getAuthentificationFront": ("cptEmail", "cptPwd"),
+    "getConsommationJournaliere": ("aboNum",),
+    "getConsommationMensuelle": ("aboNum",),
+}
+
+_SLOT = "@@{}@@"
+_SLOT_RE = re.compile(rb"@@(\w+)@@")
+
+
+def build_envelope(action: str, elts: dict, username: str, password: str, created: str) -> ET.Element:
+    """Return the ElementTree of an envelope.
+
+    Args:
+        action (str): Name of action
+        elts (dict): elements to insert into action
+        username (str): wsse:Username
+        password (str): wsse:Password
+        created (str): wsse:Created
+
+    Returns:
+        xml: completed enveloppe for requests
+    """
+    enveloppe = ET.Element("soap:Envelope")
+    enveloppe.set("xmlns:soap", NS_SOAP)
+    enveloppe.set("xmlns:xsi", NS_XSI)
+    header = ET.SubElement(enveloppe, "soap:Header")
+    security = ET.SubElement(header, "wsse:Security")
+    security.set("xmlns:wsse", NS_WSSE)
+    security.set("xmlns:wsu", NS_WSU)
+    username_token = ET.SubElement(security, "wsse:UsernameToken")
+    username_token.set("xmlns:wsu", NS_WSU)
+    username_token.set("wsu:Id", "UsernameToken-aiehdbsf52")
+    ET.SubElement(username_token, "wsse:Username").text = username
+    password_elt = ET.SubElement(username_token, "wsse:Password")
+    password_elt.set("Type", PASSWORD_TYPE)
+    password_elt.text = password
+    nonce = ET.SubElement(username_token, "wsse:Nonce")
+    nonce.set("EncodingType", NONCE_ENCODING)
+    nonce.text = NONCE
+    ET.SubElement(username_token, "wsse:Created").text = created
+    body = ET.SubElement(enveloppe, "soap:Body")
+    _action = ET.SubElement(body, f"ns2:{action}")
+    _action.set("xmlns:ns2", NS_ICL)
+    for k, v in elts.items():
+        ET.SubElement(_action, k).text = v
+    return enveloppe
+
+
+class EnvelopeTemplate:
+    """Envelope of one operation, pre-rendered as bytes."""
+
+    def __init__(self, action: str, fields: tuple) -> None:
+        """Render the envelope once with a placeholder in every variable slot."""
+        self.action = action
+        rendered = ET.tostring(
+            build_envelope(
+                action,
+                {field: _SLOT.format(field) for field in fields},
+                _SLOT.format("username"),
+                _SLOT.format("password"),
+                _SLOT.format("created"),
+            ),
+            encoding="UTF-8",
+        )
+        parts = _SLOT_RE.split(rendered)
+        # split() alternates constant chunks and slot names
+        self._chunks = parts[0::2]
+        self._slots = [slot.decode() for slot in parts[1::2]]
+
+    def render(self, username: str, password: str, created: str | None = None, **values: str) -> bytes:
+        """Return the envelope with escaped values and a fresh timestamp."""
+        values["username"] = username
+        values["password"] = password
+        values["created"] = created or datetime.now(timezone.utc).strftime(FORMAT_CREATED)
+        chunks = self._chunks
+        out = [chunks[0]]
+        for i, slot in enumerate(self._slots, 1):
+            out.append(escape(values[slot]).encode())
+            out.append(chunks[i])
+        return b"".join(out)
+
+
+TEMPLATES = {action: EnvelopeTemplate(action, fields) for action, fields in OPERATIONS.items()}
+
+# Date range of the consumption operations, sent only to walk back through the history
+RANGE_FIELDS = ("dateDebut", "dateFin")
+RANGE_TEMPLATES = {
+    action: EnvelopeTemplate(action, fields + RANGE_FIELDS)
+    for action, fields in OPERATIONS.items()
+    if "aboNum" in fields
+}
+
+
+def render_request(action: str, username: str = ANONYMOUS_USERNAME, password: str = ANONYMOUS_PASSWORD, **values):
+    """Return the body of a request, anonymous unless username and password are given.
+
+    The envelope with a date range is used when dateDebut is given.
+    """
+    templates = RANGE_TEMPLATES if "dateDebut" in values else TEMPLATES
+    return templates[action].render(username, password, **values)
@@ -0,0 +1,105 @@
+"""Import of the consumption history into the recorder long-term statistics."""
+from bisect import bisect_left
+from datetime import date
+import logging
+
+from homeassistant.components.recorder import get_instance
+from homeassistant.components.recorder.models import StatisticData, StatisticMetaData
+from homeassistant.components.recorder.statistics import async_add_external_statistics, get_last_statistics
+from homeassistant.const import UnitOfVolume
+from homeassistant.core import HomeAssistant
+from homeassistant.util import dt as dt_util, slugify
+
+from .const import DAILY, DOMAIN, NAME
+from .history import ConsumptionHistory
+
+_LOGGER = logging.getLogger(__name__)
+
+STATISTICS_BATCH_SIZE = 1000
+
+
+def statistic_id(abo_id: str, period: str) -> str:
+    """Return the id of the external statistic of a contract."""
+    return f"{DOMAIN}:{slugify(abo_id)}_{period}_consumption"
+
+
+def key_start(period: str, key: int):
+    """Return the start of the day, or of the month, of a history key."""
+    if period == DAILY:
+        day = date.fromordinal(key)
+    else:
+        year, month = divmod(key, 12)
+        day = date(year, month + 1, 1)
+    return dt_util.start_of_local_day(day)
+
+
+class VeoliaStatisticsImporter:
+    """Push the readings of the histories into the recorder as external statistics."""
+
+    def __init__(self, hass: HomeAssistant) -> None:
+        """Initialize the importer."""
+        self.hass = hass
+        # (key, sum, state) of the last imported row, by statistic id
+        self._last = {}
+
+    async def _async_last_imported(self, stat_id: str, period: str):
+        """Return (key, sum, state) of the last imported row, read once from the recorder."""
+        if stat_id not in self._last:
+            last = await get_instance(self.hass).async_add_executor_job(
+                get_last_statistics, self.hass, 1, stat_id, True, {"state", "sum"}
+            )
+            if last.get(stat_id):
+                row = last[stat_id][0]
+                start = dt_util.as_local(dt_util.utc_from_timestamp(row["start"])).date()
+                key = start.toordinal() if period == DAILY else start.year * 12 + start.month - 1
+                self._last[stat_id] = (key, row["sum"] or 0, row["state"] or 0)
+            else:
+                self._last[stat_id] = None
+        return self._last[stat_id]
+
+    def reset(self, abo_id: str, period: str) -> None:
+        """Import the whole history again on the next import, once older rows were added."""
+        self._last[statistic_id(abo_id, period)] = None
+
+    async def async_import(self, abo_id: str, period: str, history: ConsumptionHistory) -> int:
+        """Import the rows added since the last import.
+
+        The last imported row is imported again, its value may have changed
+        since (the consumption of the current month grows until it closes).
+
+        Returns:
+            int: number of rows imported
+        """
+        stat_id = statistic_id(abo_id, period)
+        last = await self._async_last_imported(stat_id, period)
+        keys = history.keys
+        liters = history.liters
+        if last is None:
+            first, total = 0, 0
+        else:
+            last_key, last_sum, last_state = last
+            first = bisect_left(keys, last_key)
+            if first < len(keys) and keys[first] == last_key:
+                total = last_sum - last_state
+            else:
+                total = last_sum
+        statistics = []
+        for i in range(first, len(keys)):
+            total += liters[i]
+            statistics.append(StatisticData(start=key_start(period, keys[i]), state=liters[i], sum=total))
+        if not statistics:
+            return 0
+
+        metadata = StatisticMetaData(
+            has_mean=False,
+            has_sum=True,
+            name=f"{NAME} {abo_id} {period} consumption",
+            source=DOMAIN,
+            statistic_id=stat_id,
+            unit_of_measurement=UnitOfVolume.LITERS,
+        )
+        for i in range(0, len(statistics), STATISTICS_BATCH_SIZE):
+            async_add_external_statistics(self.hass, metadata, statistics[i : i + STATISTICS_BATCH_SIZE])
+        self._last[stat_id] = (keys[-1], statistics[-1]["sum"], statistics[-1]["state"])
+        _LOGGER.debug("%s statistics imported into %s", len(statistics), stat_id)
+        return len(statistics)
@@ -0,0 +1,263 @@
+"""HTTP transport of the SOAP calls: timeouts, retries and circuit breaker.
+
+Every operation has its own connect/read/total timeouts, so the latency of a
+call is bounded.  Idempotent operations are retried on network errors,
+timeouts and gateway errors, with exponential backoff and full jitter.  A
+circuit breaker fails fast while the service looks down.  A response
+identical to the last one of the same call is not parsed again, its records
+come from the response cache.
+"""
+
+import asyncio
+from dataclasses import dataclass
+import logging
+import random
+import time
+from xml.parsers.expat import ExpatError
+
+import aiohttp
+
+from .capture import BodyCapture, ExchangeCapture
+from .decoder import ResponseDecoder
+from .metrics import ClientMetrics
+from .response_cache import ResponseCache, body_hash
+
+_LOGGER = logging.getLogger(__name__)
+
+READ_CHUNK_SIZE = 64 * 1024
+
+# HTTP statuses worth a retry
+RETRY_STATUSES = frozenset((502, 503, 504))
+
+
+class TransportError(Exception):
+    """Veolia service unreachable or not answering in time."""
+
+    pass
+
+
+class CircuitOpenError(TransportError):
+    """Calls are not attempted while the circuit breaker is open."""
+
+    pass
+
+
+@dataclass(frozen=True)
+class OperationPolicy:
+    """Timeouts, in seconds, and retries of an operation."""
+
+    connect: float
+    read: float
+    total: float
+    retries: int = 0
+    backoff: float = 1.0
+    max_backoff: float = 10.0
+
+    @property
+    def timeout(self) -> aiohttp.ClientTimeout:
+        """Return the aiohttp timeout of a call."""
+        return aiohttp.ClientTimeout(total=self.total, sock_connect=self.connect, sock_read=self.read)
+
+
+# Authentication is not retried: repeated failures could lock the account
+POLICIES = {
+    "getAuthentificationFront": OperationPolicy(connect=10, read=20, total=30),
+    "getConsommationJournaliere": OperationPolicy(connect=10, read=30, total=45, retries=2),
+    "getConsommationMensuelle": OperationPolicy(connect=10, read=30, total=45, retries=2),
+}
+
+
+class CircuitBreaker:
+    """Open after consecutive failures, then let one call through after a while."""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 300, max_reset_timeout: float = 3600) -> None:
+        """Initialize a closed breaker."""
+        self.failure_threshold = failure_threshold
+        self.base_reset_timeout = reset_timeout
+        self.max_reset_timeout = max_reset_timeout
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._trial = False
+
+    @property
+    def state(self) -> str:
+        """Return the state of the breaker."""
+        if self.opened_at is None:
+            return self.CLOSED
+        if time.monotonic() - self.opened_at < self.reset_timeout:
+            return self.OPEN
+        return self.HALF_OPEN
+
+    @property
+    def retry_after(self) -> float:
+        """Return the seconds before a call is let through again."""
+        if self.opened_at is None:
+            return 0
+        return max(self.opened_at + self.reset_timeout - time.monotonic(), 0)
+
+    def before_call(self) -> None:
+        """Raise CircuitOpenError unless a call may be attempted."""
+        state = self.state
+        if state == self.OPEN or (state == self.HALF_OPEN and self._trial):
+            raise CircuitOpenError(f"Veolia service unavailable, next attempt in {self.retry_after:.0f}s")
+        if state == self.HALF_OPEN:
+            self._trial = True
+
+    def release_trial(self) -> None:
+        """Let another call try, when the trial call ended without telling whether the service is back."""
+        self._trial = False
+
+    def record_success(self) -> None:
+        """Close the breaker."""
+        if self.opened_at is not None:
+            _LOGGER.info("Veolia service is back, circuit breaker closed")
+        self.failures = 0
+        self.opened_at = None
+        self._trial = False
+        self.reset_timeout = self.base_reset_timeout
+
+    def record_failure(self) -> None:
+        """Count a failure, and open the breaker past the threshold."""
+        self.failures += 1
+        if self._trial:
+            # the trial call failed: wait longer before the next one
+            self.reset_timeout = min(self.reset_timeout * 2, self.max_reset_timeout)
+        if self._trial or self.failures >= self.failure_threshold:
+            if self.opened_at is None:
+                _LOGGER.warning("Veolia service unavailable, circuit breaker opened")
+            self.opened_at = time.monotonic()
+            self._trial = False
+
+    def as_dict(self) -> dict:
+        """Return the state of the breaker, for diagnostics."""
+        return {"state": self.state, "failures": self.failures, "retry_after": round(self.retry_after)}
+
+
+class VeoliaTransport:
+    """Post SOAP envelopes with bounded latency."""
+
+    def __init__(
+        self,
+        address: str,
+        headers: dict,
+        breaker: CircuitBreaker | None = None,
+        metrics: ClientMetrics | None = None,
+        capture: ExchangeCapture | None = None,
+        response_cache: ResponseCache | None = None,
+    ) -> None:
+        """Initialize the transport; without response_cache every response is parsed."""
+        self.address = address
+        self.headers = headers
+        self.breaker = breaker or CircuitBreaker()
+        self.metrics = metrics or ClientMetrics()
+        self.capture = capture or ExchangeCapture()
+        self.response_cache = response_cache
+
+    async def async_post(self, session: aiohttp.ClientSession, action: str, datas: bytes, cache_key=None):
+        """Post a SOAP envelope and stream the response into a decoder.
+
+        With a cache_key, a response identical to the last one of the key is not
+        parsed again: the decoder holds the records decoded then, and is flagged unchanged.
+
+        Returns:
+            tuple: HTTP status code, decoder of the response
+        """
+        policy = POLICIES[action]
+        attempt = 0
+        metrics = self.metrics
+        while True:
+            try:
+                self.breaker.before_call()
+            except CircuitOpenError:
+                metrics.error("circuit_open")
+                raise
+            try:
+                status, decoder = await self._async_post_once(session, action, datas, policy, cache_key)
+            except asyncio.TimeoutError as e:
+                self.breaker.record_failure()
+                metrics.error("timeout")
+                error = TransportError(f"{action}: {type(e).__name__} {e}")
+            except aiohttp.ClientError as e:
+                self.breaker.record_failure()
+                metrics.error("network")
+                error = TransportError(f"{action}: {type(e).__name__} {e}")
+            except Exception:
+                # a response which cannot be decoded, for instance: not retried, but the trial call failed
+                self.breaker.record_failure()
+                metrics.error("unexpected")
+                raise
+            except BaseException:
+                # cancelled: the call tells nothing about the service
+                self.breaker.release_trial()
+                raise
+            else:
+                if status not in RETRY_STATUSES:
+                    self.breaker.record_success()
+                    return status, decoder
+                self.breaker.record_failure()
+                metrics.error(f"http_{status}")
+                error = TransportError(f"{action}: HTTP {status}")
+            if attempt >= policy.retries:
+                raise error
+            delay = random.uniform(0, min(policy.backoff * 2**attempt, policy.max_backoff))
+            attempt += 1
+            metrics.error("retry")
+            _LOGGER.debug("%s, retry %s in %.1fs", error, attempt, delay)
+            await asyncio.sleep(delay)
+
+    async def _async_post_once(self, session, action, datas, policy, cache_key):
+        """Post once and decode the response, keeping the exchange in the capture.
+
+        When a response of cache_key is cached, the body is hashed and kept
+        while it is read, and only decoded if its digest differs.
+        """
+        decoder = ResponseDecoder(action)
+        body = BodyCapture()
+        cache = self.response_cache if cache_key is not None else None
+        digest = body_hash() if cache is not None else None
+        # decoding waits for the digest when the response is likely the cached one
+        deferred = [] if cache is not None and cache_key in cache else None
+        outcome = None
+        start = time.perf_counter()
+        try:
+            async with session.post(self.address, headers=self.headers, data=datas, timeout=policy.timeout) as resp:
+                outcome = resp.status
+                try:
+                    async for chunk in resp.content.iter_chunked(READ_CHUNK_SIZE):
+                        body.feed(chunk)
+                        if digest is not None:
+                            digest.update(chunk)
+                        if deferred is not None:
+                            deferred.append(chunk)
+                        else:
+                            decoder.feed(chunk)
+                    if digest is not None:
+                        decoder.digest = digest.hexdigest()
+                    if deferred is not None and resp.status == 200:
+                        records = cache.get(cache_key, decoder.digest)
+                        if records is not None:
+                            self.metrics.event("cache_hit")
+                            decoder.records = records
+                            decoder.size = body.size
+                            decoder.unchanged = True
+                            return resp.status, decoder
+                    if deferred is not None:
+                        decoder.feed(b"".join(deferred))
+                    decoder.close()
+                    if cache is not None and resp.status == 200 and decoder.fault is None:
+                        self.metrics.event("cache_miss")
+                        cache.put(cache_key, decoder.digest, decoder.records)
+                except ExpatError as e:
+                    if resp.status == 200:
+                        raise aiohttp.ClientPayloadError(f"Invalid response: {e}") from e
+                return resp.status, decoder
+        except BaseException as e:
+            outcome = e
+            raise
+        finally:
+            self.capture.record(action, datas, outcome, body, time.perf_counter() - start)